@@ -39,3 +39,8 @@ from app import database
 # Initialize DB on startup (creates tables if not exist)
 with app.app_context():
     database.init_db()
+
+# Optional in-process refresher for video_reply_stats (or run run_worker.py separately)
+if os.environ.get('STATS_WORKER_IN_APP', 'False').lower() == 'true' and not USE_MOCK_DATA:
+    from app.services import stats_worker
+    stats_worker.start_in_background()
@@ -1,8 +1,77 @@
 import os
+import re
 import json
+import atexit
+import threading
+from collections import deque
 from datetime import datetime, timedelta
-from app.utils.supabase_client import supabase, supabase_admin, url, key
-from supabase import create_client
+from flask import g, has_app_context
+from cachetools import TTLCache, LRUCache
+from app.utils.supabase_client import supabase, supabase_admin, table_for
+from app.utils.ngram_index import NgramIndex
+from app.utils.write_queue import WriteBehindQueue
+from app.services import fanout
+
+# Process-wide cache of user_tokens rows (shared by request threads and fan-out workers)
+USER_CACHE_TTL_SEC = int(os.environ.get('USER_CACHE_TTL_SEC', '60'))
+_user_cache = TTLCache(maxsize=1024, ttl=USER_CACHE_TTL_SEC)
+_user_cache_lock = threading.Lock()
+
+# Newest edited replies per user, kept up to date by log_reply (LRU over users)
+FEW_SHOT_CACHE_DEPTH = int(os.environ.get('FEW_SHOT_CACHE_DEPTH', '10'))
+_few_shot_cache = LRUCache(maxsize=int(os.environ.get('FEW_SHOT_CACHE_USERS', '512')))
+_few_shot_lock = threading.Lock()
+# Examples logged while a user's cache is being loaded, merged into it when the load ends
+_few_shot_loading = {}
+
+# Per-user similarity index over edited reply_logs, loaded on first use and
+# extended by log_reply (LRU over users)
+EXAMPLE_INDEX_MAX_ROWS = int(os.environ.get('EXAMPLE_INDEX_MAX_ROWS', '50000'))
+_example_indexes = LRUCache(maxsize=int(os.environ.get('EXAMPLE_INDEX_USERS', '64')))
+_example_index_lock = threading.Lock()
+# Indexes being built in the background (with the examples logged meanwhile, replayed
+# into the index when it is ready), and users whose last build failed (not retried until expiry)
+EXAMPLE_INDEX_RETRY_SEC = int(os.environ.get('EXAMPLE_INDEX_RETRY_SEC', '300'))
+_example_index_building = {}
+_example_index_failed = TTLCache(maxsize=1024, ttl=EXAMPLE_INDEX_RETRY_SEC)
+
+# Completed thread ids per (user_id, video_id), updated in place on mark/unmark
+COMPLETED_CACHE_TTL_SEC = int(os.environ.get('COMPLETED_CACHE_TTL_SEC', '600'))
+_completed_cache = TTLCache(maxsize=int(os.environ.get('COMPLETED_CACHE_SIZE', '4096')), ttl=COMPLETED_CACHE_TTL_SEC)
+_completed_lock = threading.Lock()
+
+def _flush_writes(kind, items):
+    """
+    Writes one batch from the write-behind queue: multi-row inserts for log tables,
+    one delete per user for cleared thread states.
+    """
+    if kind == 'delete_thread_state':
+        by_user = {}
+        for item in items:
+            by_user.setdefault((item['user_id'], item['jwt']), []).append(item['comment_id'])
+        for (user_id, jwt), comment_ids in by_user.items():
+            table_for("thread_states", jwt).delete()\
+                .eq("user_id", user_id)\
+                .in_("comment_id", comment_ids)\
+                .execute()
+        return
+
+    client = supabase_admin if supabase_admin else supabase
+    client.table(kind).insert(items).execute()
+
+# Log writes and thread-state cleanups that requests don't wait on
+_write_queue = WriteBehindQueue(
+    _flush_writes,
+    max_size=int(os.environ.get('WRITE_QUEUE_MAX_SIZE', '10000')),
+    batch_size=int(os.environ.get('WRITE_QUEUE_BATCH_SIZE', '200')),
+    interval=float(os.environ.get('WRITE_QUEUE_FLUSH_SEC', '2')),
+    max_retries=int(os.environ.get('WRITE_QUEUE_RETRIES', '3')),
+    name='db-write-behind'
+)
+atexit.register(_write_queue.close)
+
+def get_write_queue_stats():
+    return _write_queue.get_stats()
 
 def init_db():
     """
@@ -36,26 +105,61 @@ def save_user_tokens(user_id, google_id, channel_id, access_token, refresh_token
         "updated_at": datetime.utcnow().isoformat()
     }
     
-    # Use Admin Client (Service Role) if available to bypass RLS
-    client = supabase_admin if supabase_admin else supabase
-    
-    # Fallback to JWT impersonation if no admin client and JWT provided
-    if not supabase_admin and jwt:
-        client = create_client(url, key)
-        client.postgrest.auth(jwt)
-
-    # Upsert
+    # Upsert (Admin Client if available to bypass RLS, else as the user via their JWT)
     try:
-        response = client.table("user_tokens").upsert(data).execute()
+        response = table_for("user_tokens", jwt).upsert(data).execute()
         return user_id
     except Exception as e:
         print(f"Error saving user tokens: {e}")
         return None
+    finally:
+        invalidate_user_cache(user_id)
+
+def _request_user_cache():
+    """
+    Returns the per-request memo dict stored on flask.g, or None outside of an app context
+    (e.g. in fan-out worker threads).
+    """
+    if not has_app_context():
+        return None
+    if '_user_cache' not in g:
+        g._user_cache = {}
+    return g._user_cache
+
+def invalidate_user_cache(user_id):
+    """
+    Drops cached user_tokens rows for a user (called whenever tokens are saved).
+    """
+    with _user_cache_lock:
+        _user_cache.pop(user_id, None)
+    request_cache = _request_user_cache()
+    if request_cache is not None:
+        request_cache.pop(user_id, None)
 
 def get_user(user_id):
     """
     Retrieves user tokens from public.user_tokens.
+    Memoized per request (flask.g) and in a short-TTL process cache,
+    so a request makes at most one round trip.
     """
+    request_cache = _request_user_cache()
+    if request_cache is not None and user_id in request_cache:
+        return request_cache[user_id]
+
+    with _user_cache_lock:
+        user = _user_cache.get(user_id)
+
+    if user is None:
+        user = _fetch_user(user_id)
+        if user is not None:
+            with _user_cache_lock:
+                _user_cache[user_id] = user
+
+    if request_cache is not None:
+        request_cache[user_id] = user
+    return user
+
+def _fetch_user(user_id):
     # Use Admin Client to bypass RLS for reading
     client = supabase_admin if supabase_admin else supabase
     
@@ -70,7 +174,7 @@ def get_user(user_id):
 
 def log_reply(user_id, video_id, comment_id, original_comment, ai_suggestion, final_reply):
     """
-    Logs a reply to the database for future learning.
+    Queues a reply log for future learning (written by the write-behind queue).
     Determines if the reply was edited by comparing ai_suggestion and final_reply.
     """
     is_edited = (ai_suggestion != final_reply) if ai_suggestion else True
@@ -84,17 +188,28 @@ def log_reply(user_id, video_id, comment_id, original_comment, ai_suggestion, fi
         "final_reply": final_reply,
         "is_edited": is_edited
     }
-    try:
-        # Logging usually allows INSERT by authenticated user, but backend might need admin if doing it offline
-        # For now, let's try admin if available
-        client = supabase_admin if supabase_admin else supabase
-        client.table("reply_logs").insert(data).execute()
-    except Exception as e:
-        print(f"Error logging reply: {e}")
+    # Written in the background (batched); the in-memory example caches are updated right away
+    if not _write_queue.put("reply_logs", data):
+        print(f"[WARN] Write queue full. Dropped reply log for {comment_id}.")
+
+    if is_edited:
+        example = {"input": original_comment, "output": final_reply}
+        with _few_shot_lock:
+            cached = _few_shot_cache.get(user_id)
+            if cached is not None:
+                cached.appendleft(example)
+            elif user_id in _few_shot_loading:
+                _few_shot_loading[user_id].append(example)
+        with _example_index_lock:
+            index = _example_indexes.get(user_id)
+            if index is None and user_id in _example_index_building:
+                _example_index_building[user_id].append(example)
+        if index is not None:
+            index.add(original_comment, example)
 
 def log_usage(user_id, input_tokens, output_tokens, model_name):
     """
-    Logs usage to public.usage_logs.
+    Queues a usage row for public.usage_logs (written by the write-behind queue).
     """
     data = {
         "user_id": user_id,
@@ -102,25 +217,110 @@ def log_usage(user_id, input_tokens, output_tokens, model_name):
         "output_tokens": output_tokens,
         "model_name": model_name
     }
+    # Written in the background (batched)
+    if not _write_queue.put("usage_logs", data):
+        print(f"[WARN] Write queue full. Dropped usage log.")
+
+def _get_example_index(user_id):
+    """
+    Returns the user's similarity index, or None while it is not loaded yet.
+    The first call starts building it from reply_logs in the background, so the
+    request isn't held up by the paged load (callers fall back to recent examples).
+    """
+    with _example_index_lock:
+        index = _example_indexes.get(user_id)
+        if index is not None:
+            return index
+        if user_id in _example_index_building or user_id in _example_index_failed:
+            return None
+        _example_index_building[user_id] = []
+    fanout.submit(_build_example_index, user_id)
+    return None
+
+def _build_example_index(user_id):
     try:
+        # Replies logged before the build started may still be queued
+        _write_queue.flush()
+        index = NgramIndex()
         client = supabase_admin if supabase_admin else supabase
-        client.table("usage_logs").insert(data).execute()
+        page_size = 1000
+        # Oldest first, so newer replies to the same comment text replace older ones
+        for start in range(0, EXAMPLE_INDEX_MAX_ROWS, page_size):
+            response = client.table("reply_logs")\
+                .select("original_comment, final_reply")\
+                .eq("user_id", user_id)\
+                .eq("is_edited", True)\
+                .order("created_at")\
+                .range(start, start + page_size - 1)\
+                .execute()
+            for row in response.data:
+                index.add(row['original_comment'], {
+                    "input": row['original_comment'],
+                    "output": row['final_reply']
+                })
+            if len(response.data) < page_size:
+                break
+
+        with _example_index_lock:
+            # Replies logged during the build, newest last (rows already read are replaced in place)
+            for example in _example_index_building.get(user_id, ()):
+                index.add(example['input'], example)
+            _example_indexes[user_id] = index
     except Exception as e:
-        print(f"Error logging usage: {e}")
+        print(f"[WARN] Failed to build example index for {user_id} (retry in {EXAMPLE_INDEX_RETRY_SEC}s): {e}")
+        with _example_index_lock:
+            _example_index_failed[user_id] = True
+    finally:
+        with _example_index_lock:
+            _example_index_building.pop(user_id, None)
 
-def get_few_shot_examples(user_id, limit=3):
+def get_few_shot_examples(user_id, limit=3, comment_text=None):
     """
-    Retrieves recent EDITED replies to use as few-shot examples.
+    Retrieves EDITED replies to use as few-shot examples.
     Only returns examples where the user actually changed the AI's suggestion (or wrote it manually).
+    With comment_text, the past exchanges most similar to it are picked first,
+    topped up with the most recent ones (only recent ones until the index is loaded).
+    """
+    if not comment_text:
+        return _get_recent_examples(user_id, limit)
+
+    try:
+        index = _get_example_index(user_id)
+        examples = index.search(comment_text, limit) if index is not None else []
+    except Exception as e:
+        print(f"Error searching examples: {e}")
+        examples = []
+
+    if len(examples) < limit:
+        seen = {ex['input'] for ex in examples}
+        for ex in _get_recent_examples(user_id, limit):
+            if len(examples) >= limit:
+                break
+            if ex['input'] not in seen:
+                examples.append(ex)
+    return examples
+
+def _get_recent_examples(user_id, limit):
     """
+    Most recent edited replies, served from the per-user cache once loaded;
+    log_reply keeps it current.
+    """
+    with _few_shot_lock:
+        cached = _few_shot_cache.get(user_id)
+        if cached is not None and limit <= FEW_SHOT_CACHE_DEPTH:
+            return list(cached)[:limit]
+        logged = _few_shot_loading.setdefault(user_id, [])
+
     try:
+        # Replies logged before the load started may still be queued
+        _write_queue.flush()
         client = supabase_admin if supabase_admin else supabase
         response = client.table("reply_logs")\
             .select("original_comment, final_reply")\
             .eq("user_id", user_id)\
             .eq("is_edited", True)\
             .order("created_at", desc=True)\
-            .limit(limit)\
+            .limit(max(limit, FEW_SHOT_CACHE_DEPTH))\
             .execute()
         
         examples = []
@@ -129,12 +329,24 @@ def get_few_shot_examples(user_id, limit=3):
                 "input": row['original_comment'],
                 "output": row['final_reply']
             })
-        return examples
+
+        with _few_shot_lock:
+            # Replies logged during the load come first (newest first); some may also have been read
+            recent = logged[::-1]
+            examples = recent + [ex for ex in examples if ex not in recent]
+            # A cache installed meanwhile (or already there when limit is large) is kept current by log_reply
+            if _few_shot_cache.get(user_id) is None:
+                _few_shot_cache[user_id] = deque(examples[:FEW_SHOT_CACHE_DEPTH], maxlen=FEW_SHOT_CACHE_DEPTH)
+        return examples[:limit]
     except Exception as e:
         import traceback
         traceback.print_exc()
         print(f"Error fetching examples: {e}")
         return []
+    finally:
+        with _few_shot_lock:
+            if _few_shot_loading.get(user_id) is logged:
+                del _few_shot_loading[user_id]
 
 def get_daily_reply_count(user_id):
     """
@@ -157,27 +369,87 @@ def get_daily_reply_count(user_id):
         print(f"Error counting daily replies: {e}")
         return 0
 
-def mark_thread_complete(user_id, comment_id, status='completed', jwt=None):
+# Cleared when thread_states turns out not to have video_id yet (add_thread_states_video_id.sql
+# not applied); reads and writes then fall back to unscoped rows until the next restart
+_thread_states_has_video_id = True
+_VIDEO_ID_RE = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+def _is_missing_video_id_column(e):
+    error_msg = str(e)
+    return "video_id" in error_msg and ("PGRST204" in error_msg or "42703" in error_msg)
+
+def _scoped_video_id(video_id):
+    """
+    Returns video_id if thread_states can be scoped by it (column present, valid YouTube id).
+    """
+    if video_id and _thread_states_has_video_id and _VIDEO_ID_RE.match(video_id):
+        return video_id
+    return None
+
+def _update_completed_cache(user_id, comment_ids, video_id=None, completed=False):
+    """
+    Applies a mark (completed=True) or unmark to the cached completed sets.
+    A mark without a video_id can't be placed, so the user's sets are dropped.
+    """
+    with _completed_lock:
+        keys = [k for k in _completed_cache.keys() if k[0] == user_id]
+        if completed and not video_id:
+            for k in keys:
+                _completed_cache.pop(k, None)
+            return
+        for k in keys:
+            completed_ids = _completed_cache.get(k)
+            if completed_ids is None:
+                continue
+            if completed and k[1] == video_id:
+                _completed_cache[k] = completed_ids.union(comment_ids)
+            else:
+                _completed_cache[k] = completed_ids.difference(comment_ids)
+
+def mark_thread_complete(user_id, comment_id, status='completed', jwt=None, video_id=None):
     """
     Marks a thread as complete (or other status) in thread_states table.
     """
-    data = {
-        "user_id": user_id,
-        "comment_id": comment_id,
-        "status": status,
-        "updated_at": datetime.utcnow().isoformat()
-    }
-    try:
-        client = supabase_admin if supabase_admin else supabase
-        
-        # If no admin client and JWT provided, authenticate as user
-        if not supabase_admin and jwt:
-            client = create_client(url, key)
-            client.postgrest.auth(jwt)
+    return mark_threads_complete(user_id, [comment_id], status=status, jwt=jwt, video_id=video_id).get(comment_id, False)
 
+def mark_threads_complete(user_id, comment_ids, status='completed', jwt=None, video_id=None):
+    """
+    Marks many threads in a single upsert. Returns {comment_id: bool}
+    (the upsert succeeds or fails as a whole). video_id scopes the rows for
+    get_completed_threads; rows without one are matched for every video.
+    """
+    comment_ids = list(dict.fromkeys(comment_ids))
+    if not comment_ids:
+        return {}
+    updated_at = datetime.utcnow().isoformat()
+    rows = [
+        {
+            "user_id": user_id,
+            "comment_id": comment_id,
+            "status": status,
+            "updated_at": updated_at
+        }
+        for comment_id in comment_ids
+    ]
+    global _thread_states_has_video_id
+    scoped_video_id = _scoped_video_id(video_id)
+    if scoped_video_id:
+        for row in rows:
+            row["video_id"] = scoped_video_id
+    try:
         # We use upsert to handle re-marking or status changes
-        client.table("thread_states").upsert(data, on_conflict="user_id, comment_id").execute()
-        return True
+        try:
+            table_for("thread_states", jwt).upsert(rows, on_conflict="user_id, comment_id").execute()
+        except Exception as e:
+            if not (scoped_video_id and _is_missing_video_id_column(e)):
+                raise
+            print(f"[WARN] thread_states has no video_id column (run add_thread_states_video_id.sql). Saving unscoped.")
+            _thread_states_has_video_id = False
+            for row in rows:
+                row.pop("video_id", None)
+            table_for("thread_states", jwt).upsert(rows, on_conflict="user_id, comment_id").execute()
+        _update_completed_cache(user_id, comment_ids, video_id, completed=(status == 'completed'))
+        return dict.fromkeys(comment_ids, True)
     except Exception as e:
         # Suppress "table not found" error
         error_msg = str(e)
@@ -185,31 +457,40 @@ def mark_thread_complete(user_id, comment_id, status='completed', jwt=None):
             print(f"[WARN] Thread states table missing. Skipping mark complete.")
         else:
             print(f"Error marking thread complete: {e}")
-        return False
+        return dict.fromkeys(comment_ids, False)
 
 def delete_thread_state(user_id, comment_id, jwt=None):
     """
     Deletes a thread state (un-marks completion) from thread_states table.
     """
+    return delete_thread_states(user_id, [comment_id], jwt=jwt).get(comment_id, False)
+
+# Ids per DELETE ... WHERE comment_id IN (...) call, to keep the request URL short
+THREAD_STATES_DELETE_CHUNK = 200
+
+def delete_thread_states(user_id, comment_ids, jwt=None):
+    """
+    Deletes many thread states with one in_() filtered delete (per 200 ids).
+    Returns {comment_id: bool}; False for ids that had no row (or on error).
+    """
+    comment_ids = list(dict.fromkeys(comment_ids))
+    results = dict.fromkeys(comment_ids, False)
     try:
-        client = supabase_admin if supabase_admin else supabase
-        
-        # If no admin client and JWT provided, authenticate as user
-        if not supabase_admin and jwt:
-            client = create_client(url, key)
-            client.postgrest.auth(jwt)
+        for start in range(0, len(comment_ids), THREAD_STATES_DELETE_CHUNK):
+            chunk = comment_ids[start:start + THREAD_STATES_DELETE_CHUNK]
+            response = table_for("thread_states", jwt)\
+                .delete()\
+                .eq("user_id", user_id)\
+                .in_("comment_id", chunk)\
+                .execute()
+            for row in response.data or []:
+                results[row['comment_id']] = True
+        _update_completed_cache(user_id, comment_ids)
 
-        response = client.table("thread_states")\
-            .delete()\
-            .eq("user_id", user_id)\
-            .eq("comment_id", comment_id)\
-            .execute()
-            
-        if not response.data:
-            print(f"[WARN] No thread state deleted for {comment_id}. Possible RLS issue or ID mismatch.")
-            return False
-            
-        return True
+        missing = [comment_id for comment_id, deleted in results.items() if not deleted]
+        if missing:
+            print(f"[WARN] No thread state deleted for {len(missing)} comment(s) (e.g. {missing[0]}). Possible RLS issue or ID mismatch.")
+        return results
     except Exception as e:
         # Suppress "table not found" error
         error_msg = str(e)
@@ -217,27 +498,53 @@ def delete_thread_state(user_id, comment_id, jwt=None):
             pass
         else:
             print(f"Error deleting thread state: {e}")
-        return False
+        return results
 
-def get_completed_threads(user_id, jwt=None):
+def clear_thread_state_later(user_id, comment_id, jwt=None):
     """
-    Returns a list of comment_ids that are marked as completed for the user.
+    Queues the removal of a thread state (e.g. after replying) instead of waiting on it.
     """
-    try:
-        client = supabase_admin if supabase_admin else supabase
+    _update_completed_cache(user_id, [comment_id])
+    return _write_queue.put("delete_thread_state", {"user_id": user_id, "comment_id": comment_id, "jwt": jwt})
 
-        # If no admin client and JWT provided, authenticate as user
-        if not supabase_admin and jwt:
-            client = create_client(url, key)
-            client.postgrest.auth(jwt)
+def get_completed_threads(user_id, video_id=None, jwt=None):
+    """
+    Returns the frozenset of comment_ids marked as completed for the user's video
+    (rows saved before thread_states had a video_id are included for every video).
+    Served from the per-(user, video) cache; without a video_id every completed id
+    of the user is queried (uncached). Without the video_id column (migration not
+    applied) or for ids that aren't YouTube video ids, the unscoped set is returned.
+    """
+    global _thread_states_has_video_id
+    cache_key = (user_id, video_id)
+    if video_id:
+        with _completed_lock:
+            cached = _completed_cache.get(cache_key)
+        if cached is not None:
+            return cached
 
-        response = client.table("thread_states")\
+    def query(scoped_video_id):
+        query = table_for("thread_states", jwt)\
             .select("comment_id")\
             .eq("user_id", user_id)\
-            .eq("status", "completed")\
-            .execute()
+            .eq("status", "completed")
+        if scoped_video_id:
+            # Uses the (user_id, video_id, status) index
+            query = query.or_(f"video_id.eq.{scoped_video_id},video_id.is.null")
+        return query.execute()
 
-        return [row['comment_id'] for row in response.data]
+    try:
+        scoped_video_id = _scoped_video_id(video_id)
+        try:
+            response = query(scoped_video_id)
+        except Exception as e:
+            if not (scoped_video_id and _is_missing_video_id_column(e)):
+                raise
+            print(f"[WARN] thread_states has no video_id column (run add_thread_states_video_id.sql). Querying unscoped.")
+            _thread_states_has_video_id = False
+            response = query(None)
+
+        completed_ids = frozenset(row['comment_id'] for row in response.data)
     except Exception as e:
         # Suppress "table not found" error to avoid log spam
         error_msg = str(e)
@@ -245,8 +552,125 @@ def get_completed_threads(user_id, jwt=None):
             pass # Silent fail for missing table
         else:
             print(f"Error getting completed threads: {e}")
+        return frozenset()
+
+    if video_id:
+        with _completed_lock:
+            _completed_cache[cache_key] = completed_ids
+    return completed_ids
+
+def get_video_reply_stats(user_id, video_ids):
+    """
+    Returns {video_id: row} of precomputed reply stats from video_reply_stats.
+    """
+    if not video_ids:
+        return {}
+    try:
+        client = supabase_admin if supabase_admin else supabase
+        response = client.table("video_reply_stats")\
+            .select("video_id, total, replied, pending, unreplied, rate, updated_at")\
+            .eq("user_id", user_id)\
+            .in_("video_id", list(video_ids))\
+            .execute()
+        return {row['video_id']: row for row in response.data}
+    except Exception as e:
+        # Suppress "table not found" error (stats are then counted live)
+        error_msg = str(e)
+        if "PGRST205" in error_msg or "Could not find the table" in error_msg:
+            pass
+        else:
+            print(f"Error getting video reply stats: {e}")
+        return {}
+
+def save_video_reply_stats(user_id, stats_map):
+    """
+    Upserts {video_id: stats} into video_reply_stats.
+    """
+    rows = [
+        {
+            "user_id": user_id,
+            "video_id": video_id,
+            "total": stats['total'],
+            "replied": stats['replied'],
+            "pending": stats.get('pending', 0),
+            "unreplied": stats['unreplied'],
+            "rate": stats['rate'],
+            "updated_at": stats.get('updated_at') or datetime.utcnow().isoformat()
+        }
+        for video_id, stats in stats_map.items()
+    ]
+    if not rows:
+        return True
+    try:
+        client = supabase_admin if supabase_admin else supabase
+        client.table("video_reply_stats").upsert(rows, on_conflict="user_id, video_id").execute()
+        return True
+    except Exception as e:
+        error_msg = str(e)
+        if "PGRST205" in error_msg or "Could not find the table" in error_msg:
+            print(f"[WARN] video_reply_stats table missing. Skipping stats save.")
+        else:
+            print(f"Error saving video reply stats: {e}")
+        return False
+
+def get_active_user_ids(days=7):
+    """
+    Returns ids of users who signed in (saved tokens) within the last 'days' days.
+    """
+    try:
+        since = (datetime.utcnow() - timedelta(days=days)).isoformat()
+        client = supabase_admin if supabase_admin else supabase
+        response = client.table("user_tokens")\
+            .select("user_id")\
+            .gte("updated_at", since)\
+            .execute()
+        return [row['user_id'] for row in response.data]
+    except Exception as e:
+        print(f"Error getting active users: {e}")
         return []
 
+def get_channel_info(user_id):
+    """
+    Returns the cached channel_info row of a user, or None.
+    """
+    try:
+        client = supabase_admin if supabase_admin else supabase
+        response = client.table("channel_info").select("*").eq("user_id", user_id).execute()
+        return response.data[0] if response.data else None
+    except Exception as e:
+        # Suppress "table not found" error (channel info is then fetched from YouTube)
+        error_msg = str(e)
+        if "PGRST205" in error_msg or "Could not find the table" in error_msg:
+            pass
+        else:
+            print(f"Error getting channel info: {e}")
+        return None
+
+def save_channel_info(user_id, info):
+    """
+    Upserts a user's channel metadata into channel_info.
+    """
+    data = {
+        "user_id": user_id,
+        "channel_id": info['channel_id'],
+        "name": info['name'],
+        "icon": info['icon'],
+        "subscriber_count": info['subscriber_count'],
+        "uploads_playlist_id": info['uploads_playlist_id'],
+        "updated_at": info.get('updated_at') or datetime.utcnow().isoformat()
+    }
+    try:
+        client = supabase_admin if supabase_admin else supabase
+        client.table("channel_info").upsert(data).execute()
+        return True
+    except Exception as e:
+        error_msg = str(e)
+        if "PGRST205" in error_msg or "Could not find the table" in error_msg:
+            print(f"[WARN] channel_info table missing. Skipping channel info save.")
+        else:
+            print(f"Error saving channel info: {e}")
+        return False
+
 def create_template(user_id, name, text):
     """
     Creates a reply template.
@@ -1,6 +1,6 @@
 import os
-from flask import redirect, request, session, url_for, render_template, jsonify
-from googleapiclient.discovery import build
+import json
+from flask import redirect, request, session, url_for, render_template, jsonify, Response, stream_with_context
 from google.auth.exceptions import RefreshError
 from app import app
 from app import database
@@ -13,6 +13,17 @@ else:
     from app.services import youtube_service
 
 from app.services import ai_service
+from app.services import google_clients
+from app.services import fanout
+from app.services import quota
+
+# Overall time budget for a streamed batch generation
+BATCH_DEADLINE_SEC = int(os.environ.get('BATCH_DEADLINE_SEC', '300'))
+
+# Largest id list accepted by the bulk mark/unmark endpoints
+BULK_MAX_IDS = int(os.environ.get('BULK_MAX_IDS', '500'))
+# Largest batch for /post_replies_batch (each reply costs 50 quota units)
+POST_REPLIES_MAX = int(os.environ.get('POST_REPLIES_MAX', '50'))
 
 @app.route('/privacy')
 def privacy():
@@ -101,8 +112,9 @@ def save_session():
         try:
             import google.oauth2.credentials
             creds = google.oauth2.credentials.Credentials(token=access_token)
-            youtube = build('youtube', 'v3', credentials=creds)
-            response = youtube.channels().list(mine=True, part='id').execute()
+            youtube = google_clients.build_client('youtube', 'v3', creds, user_id=user_id)
+            # Fetch the channel metadata in the same call so /videos doesn't need to look it up again
+            response = youtube.channels().list(mine=True, part='id,snippet,statistics,contentDetails').execute()
             if response['items']:
                 channel_id = response['items'][0]['id']
                 database.save_user_tokens(
@@ -114,6 +126,7 @@ def save_session():
                     token_expiry=None,
                     jwt=supabase_jwt # Pass JWT for RLS
                 )
+                youtube_service.store_channel_metadata(user_id, response['items'][0])
         except Exception as e:
             print(f"[WARN] Failed to fetch channel ID: {e}")
 
@@ -171,15 +184,18 @@ def videos():
         end = start + per_page
         videos_subset = all_videos[start:end]
         
-        # Fetch stats for each video in the subset
+        # Fetch stats in parallel for videos that don't already have them
+        # (the unreplied_desc sort attaches them while ranking)
+        missing_ids = [video['id'] for video in videos_subset if 'reply_stats' not in video]
+        stats_map = youtube_service.get_reply_stats_map(session['user_id'], missing_ids) if missing_ids else {}
         for video in videos_subset:
-            try:
-                # Reuse get_video_comments to get stats
-                data = youtube_service.get_video_comments(session['user_id'], video['id'])
-                video['reply_stats'] = data['stats']
-            except Exception as e:
-                print(f"Error fetching stats for video {video['id']}: {e}")
-                video['reply_stats'] = {'total': 0, 'replied': 0, 'unreplied': 0, 'rate': 0}
+            if 'reply_stats' not in video:
+                # Videos that failed or timed out fall back to empty stats
+                video['reply_stats'] = stats_map.get(video['id'], {'total': 0, 'replied': 0, 'unreplied': 0, 'rate': 0})
+
+        # Oldest stats timestamp on the page (stats come from video_reply_stats when fresh enough)
+        stats_times = [video['reply_stats']['updated_at'] for video in videos_subset if video['reply_stats'].get('updated_at')]
+        stats_updated_at = min(stats_times)[:16].replace('T', ' ') if stats_times else None
 
         reply_stats = youtube_service.get_aggregated_reply_stats(session['user_id'], limit=5)
         
@@ -189,13 +205,40 @@ def videos():
                              channel_info=channel_info,
                              page=page,
                              total_pages=total_pages,
-                             reply_stats=reply_stats)
+                             reply_stats=reply_stats,
+                             stats_updated_at=stats_updated_at)
     except RefreshError:
         session.clear()
         return redirect(url_for('login'))
     except Exception as e:
         return f"An error occurred: {str(e)}", 500
 
+@app.route('/videos/refresh_stats', methods=['POST'])
+def refresh_video_stats():
+    """
+    Recounts the reply stats of the videos on the current page on demand.
+    """
+    if 'user_id' not in session:
+        return redirect(url_for('index'))
+
+    if not database.get_user(session['user_id']):
+        session.clear()
+        return redirect(url_for('index'))
+
+    video_ids = request.form.getlist('video_id')[:50]
+    if video_ids:
+        try:
+            youtube_service.get_reply_stats_map(session['user_id'], video_ids, refresh=True)
+        except RefreshError:
+            session.clear()
+            return redirect(url_for('login'))
+        except Exception as e:
+            return f"An error occurred: {str(e)}", 500
+
+    return redirect(url_for('videos',
+                            sort=request.form.get('sort', 'unreplied_desc'),
+                            page=request.form.get('page', 1, type=int)))
+
 @app.route('/comments/<video_id>')
 def comments(video_id):
     if 'user_id' not in session:
@@ -207,30 +250,54 @@ def comments(video_id):
 
     sort_by = request.args.get('sort', 'date_desc')
     filter_by = request.args.get('filter', 'unreplied')  # Default filter: unreplied
-    comments_data = youtube_service.get_video_comments(session['user_id'], video_id, sort_by)
+    # Only the first page is rendered here; the rest is loaded from /api/comments while scrolling
+    page_data = youtube_service.get_comments_page(session['user_id'], video_id, filter_by=filter_by, sort_by=sort_by)
     video_details = youtube_service.get_video_details(session['user_id'], video_id)
     video_title = video_details.get('title', 'Unknown Video')
 
-    # Filter comments based on status
-    all_comments = comments_data['comments']
-    if filter_by == 'unreplied':
-        filtered_comments = [c for c in all_comments if not c['is_replied'] and not c['is_manually_completed']]
-    elif filter_by == 'pending':
-        filtered_comments = [c for c in all_comments if c['is_manually_completed']]
-    elif filter_by == 'replied':
-        filtered_comments = [c for c in all_comments if c['is_replied']]
-    else:
-        filtered_comments = all_comments
-
     return render_template('comments.html',
-                         comments=filtered_comments,
-                         all_comments=all_comments,
+                         comments=page_data['comments'],
+                         next_cursor=page_data['next_cursor'],
                          video_id=video_id,
                          video=video_details,
                          video_title=video_title,
                          current_sort=sort_by,
                          current_filter=filter_by,
-                         reply_stats=comments_data['stats'])
+                         reply_stats=page_data['stats'])
+
+@app.route('/api/comments/<video_id>', methods=['GET'])
+def api_comments(video_id):
+    """
+    Returns one page of comments as JSON: the records, their rendered cards,
+    the cursor of the next page (null at the end) and the stats when known.
+    """
+    if 'user_id' not in session:
+        return {'status': 'error', 'message': 'Unauthorized'}, 401
+
+    if not database.get_user(session['user_id']):
+        session.clear()
+        return {'status': 'error', 'message': 'User not found'}, 401
+
+    sort_by = request.args.get('sort', 'date_desc')
+    filter_by = request.args.get('filter', 'unreplied')
+    cursor = request.args.get('cursor')
+    try:
+        page_data = youtube_service.get_comments_page(session['user_id'], video_id,
+                                                      filter_by=filter_by, sort_by=sort_by, cursor=cursor)
+    except RefreshError:
+        session.clear()
+        return {'status': 'error', 'message': 'Token expired, please log in again'}, 401
+    except Exception as e:
+        return {'status': 'error', 'message': str(e)}, 500
+
+    html = render_template('comment_cards.html', comments=page_data['comments'], video_id=video_id)
+    return jsonify({
+        'status': 'success',
+        'comments': [comment.to_dict() for comment in page_data['comments']],
+        'html': html,
+        'next_cursor': page_data['next_cursor'],
+        'stats': page_data['stats']
+    })
 
 @app.route('/post_reply', methods=['POST'])
 def post_reply():
@@ -246,7 +313,7 @@ def post_reply():
     text = data.get('reply_text')
     
     try:
-        response = youtube_service.post_reply(session['user_id'], parent_id, text)
+        response = youtube_service.post_reply(session['user_id'], parent_id, text, video_id=data.get('video_id'))
         
         # Log the reply for AI learning
         original_comment = data.get('original_comment', '')
@@ -275,6 +342,70 @@ def post_reply():
     except Exception as e:
         return {'status': 'error', 'message': str(e)}, 500
 
+@app.route('/post_replies_batch', methods=['POST'])
+def post_replies_batch():
+    """
+    Posts several replies concurrently and streams one NDJSON line per reply as it
+    finishes, then a summary line ({'done': true, 'succeeded', 'failed'}).
+    """
+    if 'user_id' not in session:
+        return {'status': 'error', 'message': 'Unauthorized'}, 401
+
+    if not database.get_user(session['user_id']):
+        session.clear()
+        return {'status': 'error', 'message': 'User not found'}, 401
+
+    user_id = session['user_id']
+    data = request.get_json()
+    video_id = data.get('video_id', '')
+    # Keyed by parent_id (a second reply to the same comment in one batch is ignored)
+    items = {}
+    for item in data.get('replies', []):
+        if item.get('parent_id') and item.get('reply_text') and item['parent_id'] not in items:
+            items[item['parent_id']] = item
+    if not items:
+        return {'status': 'error', 'message': 'No replies given'}, 400
+    if len(items) > POST_REPLIES_MAX:
+        return {'status': 'error', 'message': f'Too many replies (max {POST_REPLIES_MAX})'}, 400
+
+    replies = {parent_id: item['reply_text'] for parent_id, item in items.items()}
+
+    def stream():
+        succeeded = failed = 0
+        for parent_id, response, error in youtube_service.post_replies(user_id, replies):
+            if error is not None:
+                failed += 1
+                line = {'parent_id': parent_id, 'status': 'error', 'message': str(error)}
+                if isinstance(error, RefreshError):
+                    line['message'] = 'Token expired, please log in again'
+                yield json.dumps(line, ensure_ascii=False) + '\n'
+                continue
+
+            succeeded += 1
+            item = items[parent_id]
+            # Queued; the write-behind queue inserts these in batches
+            database.log_reply(
+                user_id=user_id,
+                video_id=item.get('video_id', video_id),
+                comment_id=parent_id,
+                original_comment=item.get('original_comment', ''),
+                ai_suggestion=item.get('ai_suggestion', ''),
+                final_reply=item['reply_text']
+            )
+            line = {
+                'parent_id': parent_id,
+                'status': 'success',
+                'id': response['id'],
+                'author_image': response['snippet'].get('authorProfileImageUrl', ''),
+                'author_name': response['snippet'].get('authorDisplayName', ''),
+                'published_at': response['snippet'].get('publishedAt', '')
+            }
+            yield json.dumps(line, ensure_ascii=False) + '\n'
+
+        yield json.dumps({'done': True, 'succeeded': succeeded, 'failed': failed}) + '\n'
+
+    return Response(stream_with_context(stream()), mimetype='application/x-ndjson')
+
 @app.route('/generate_reply', methods=['POST'])
 def generate_reply():
     if 'user_id' not in session:
@@ -293,7 +424,7 @@ def generate_reply():
         video_description = None
         if video_id:
             try:
-                # Reuse get_video_details (CACHE THIS IN A REAL APP!)
+                # Served from the video metadata cache when available
                 video_details = youtube_service.get_video_details(session['user_id'], video_id)
                 if video_details:
                     video_title = video_details.get('title')
@@ -301,17 +432,20 @@ def generate_reply():
             except Exception as e:
                 print(f"[WARN] Failed to fetch video context for AI: {e}")
 
-        # Get few-shot examples from database
-        examples = database.get_few_shot_examples(session['user_id'])
+        # Get the past exchanges most similar to this comment as few-shot examples
+        examples = database.get_few_shot_examples(session['user_id'], comment_text=comment_text)
         
         suggestions, usage = ai_service.generate_reply_suggestions(
             comment_text, 
             examples,
             video_title=video_title,
-            video_description=video_description
+            video_description=video_description,
+            user_id=session['user_id'],
+            refresh=bool(data.get('regenerate'))
         )
         
-        if usage:
+        # Cache hits cost no tokens and are not logged
+        if usage and not usage.get('cached'):
             database.log_usage(
                 user_id=session['user_id'],
                 input_tokens=usage['input_tokens'],
@@ -326,6 +460,83 @@ def generate_reply():
         print(tb) # Still print to server log
         return {'status': 'error', 'message': f"{str(e)}\n\nTraceback:\n{tb}"}, 500
 
+@app.route('/generate_replies_batch', methods=['POST'])
+def generate_replies_batch():
+    """
+    Generates suggestions for many comments of one video.
+    Video context is fetched once, comments are packed
+    BATCH_PROMPT_SIZE per prompt, chunks run concurrently (bounded by
+    ai_service.rate_limiter) and results are streamed back as NDJSON lines
+    in completion order.
+    """
+    if 'user_id' not in session:
+        return {'status': 'error', 'message': 'Unauthorized'}, 401
+
+    if not database.get_user(session['user_id']):
+        session.clear()
+        return {'status': 'error', 'message': 'User not found'}, 401
+
+    user_id = session['user_id']
+    data = request.get_json()
+    video_id = data.get('video_id')
+    comments = [c for c in data.get('comments', []) if c.get('id') and c.get('text')]
+
+    video_title = None
+    video_description = None
+    if video_id:
+        try:
+            video_details = youtube_service.get_video_details(user_id, video_id)
+            if video_details:
+                video_title = video_details.get('title')
+                video_description = video_details.get('description')
+        except Exception as e:
+            print(f"[WARN] Failed to fetch video context for AI: {e}")
+
+    # Several comments share one prompt; chunks are generated concurrently
+    chunk_size = ai_service.BATCH_PROMPT_SIZE
+    chunks = [comments[i:i + chunk_size] for i in range(0, len(comments), chunk_size)]
+
+    # Few-shot examples are picked per chunk by similarity to its comments (in-memory lookup)
+    chunk_examples = [
+        database.get_few_shot_examples(user_id, comment_text=' '.join(c['text'] for c in chunk))
+        for chunk in chunks
+    ]
+
+    def generate_chunk(index):
+        return ai_service.generate_reply_suggestions_batch(
+            chunks[index],
+            chunk_examples[index],
+            video_title=video_title,
+            video_description=video_description,
+            user_id=user_id
+        )
+
+    def stream():
+        for index, results, error in fanout.iter_completed(user_id, generate_chunk, range(len(chunks)), deadline=BATCH_DEADLINE_SEC,
+                                                             pool=fanout.AI_POOL):
+            if error is not None:
+                for comment in chunks[index]:
+                    line = {'comment_id': comment['id'], 'status': 'error', 'message': str(error)}
+                    yield json.dumps(line, ensure_ascii=False) + '\n'
+                continue
+
+            for comment_id, (suggestions, usage) in results.items():
+                if usage:
+                    if not usage.get('cached'):
+                        database.log_usage(
+                            user_id=user_id,
+                            input_tokens=usage['input_tokens'],
+                            output_tokens=usage['output_tokens'],
+                            model_name=usage['model_name']
+                        )
+                    line = {'comment_id': comment_id, 'status': 'success', 'suggestions': suggestions}
+                else:
+                    # Generation errors are reported as the only suggestion
+                    line = {'comment_id': comment_id, 'status': 'error', 'message': suggestions[0] if suggestions else ''}
+                yield json.dumps(line, ensure_ascii=False) + '\n'
+
+    return Response(stream_with_context(stream()), mimetype='application/x-ndjson')
+
 @app.route('/delete_comment', methods=['POST'])
 def delete_comment():
     if 'user_id' not in session:
@@ -339,7 +550,7 @@ def delete_comment():
         data = request.get_json()
         comment_id = data.get('comment_id')
         
-        youtube_service.delete_comment(session['user_id'], comment_id)
+        youtube_service.delete_comment(session['user_id'], comment_id, video_id=data.get('video_id'))
         return {'status': 'success'}
     except RefreshError:
         session.clear()
@@ -386,7 +597,8 @@ def mark_complete():
         user_data = database.get_user(session['user_id'])
         jwt = user_data.get('jwt') if user_data else None
 
-        if database.mark_thread_complete(session['user_id'], comment_id, jwt=jwt):
+        if database.mark_thread_complete(session['user_id'], comment_id, jwt=jwt, video_id=data.get('video_id')):
+            youtube_service.invalidate_reply_stats(session['user_id'], data.get('video_id'))
             return {'status': 'success'}
         else:
             return {'status': 'error', 'message': 'Failed to mark complete'}, 500
@@ -412,12 +624,61 @@ def unmark_complete():
         jwt = user_data.get('jwt') if user_data else None
 
         if database.delete_thread_state(session['user_id'], comment_id, jwt=jwt):
+            youtube_service.invalidate_reply_stats(session['user_id'], data.get('video_id'))
             return {'status': 'success'}
         else:
             return {'status': 'error', 'message': 'Failed to unmark complete'}, 500
     except Exception as e:
         return {'status': 'error', 'message': str(e)}, 500
 
+def _bulk_thread_states(update):
+    """
+    Shared body of /mark_complete_batch and /unmark_complete_batch:
+    update(user_id, comment_ids, jwt, video_id) returns {comment_id: bool}.
+    """
+    if 'user_id' not in session:
+        return {'status': 'error', 'message': 'Unauthorized'}, 401
+
+    user_data = database.get_user(session['user_id'])
+    if not user_data:
+        session.clear()
+        return {'status': 'error', 'message': 'User not found'}, 401
+
+    try:
+        data = request.get_json()
+        comment_ids = [comment_id for comment_id in data.get('comment_ids', []) if comment_id]
+        if not comment_ids:
+            return {'status': 'error', 'message': 'No comment_ids given'}, 400
+        if len(comment_ids) > BULK_MAX_IDS:
+            return {'status': 'error', 'message': f'Too many comment_ids (max {BULK_MAX_IDS})'}, 400
+
+        results = update(session['user_id'], comment_ids, user_data.get('jwt'), data.get('video_id'))
+        succeeded = sum(1 for ok in results.values() if ok)
+        if succeeded:
+            youtube_service.invalidate_reply_stats(session['user_id'], data.get('video_id'))
+        return {
+            'status': 'success',
+            'results': {comment_id: 'success' if ok else 'error' for comment_id, ok in results.items()},
+            'succeeded': succeeded,
+            'failed': len(results) - succeeded
+        }
+    except Exception as e:
+        return {'status': 'error', 'message': str(e)}, 500
+
+@app.route('/mark_complete_batch', methods=['POST'])
+def mark_complete_batch():
+    """Marks many threads as pending with a single thread_states upsert."""
+    return _bulk_thread_states(
+        lambda user_id, comment_ids, jwt, video_id: database.mark_threads_complete(user_id, comment_ids, jwt=jwt, video_id=video_id)
+    )
+
+@app.route('/unmark_complete_batch', methods=['POST'])
+def unmark_complete_batch():
+    """Clears many thread states with a single in_() delete."""
+    return _bulk_thread_states(
+        lambda user_id, comment_ids, jwt, video_id: database.delete_thread_states(user_id, comment_ids, jwt=jwt)
+    )
+
 @app.route('/templates')
 def templates():
     """Template management page"""
@@ -468,3 +729,26 @@ def list_templates():
 
     templates = database.get_templates(session['user_id'])
     return jsonify({'status': 'success', 'templates': templates})
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """
+    The signed-in user's YouTube quota usage, plus process-wide ratios only (suggestion
+    cache hit rate, write queue fill): raw counters would reveal other users' activity.
+    """
+    if 'user_id' not in session:
+        return jsonify({'status': 'error', 'message': 'Not authenticated'}), 401
+
+    if not database.get_user(session['user_id']):
+        session.clear()
+        return jsonify({'status': 'error', 'message': 'User not found'}), 401
+
+    quota_status = quota.get_status(session['user_id'])
+    write_queue = database.get_write_queue_stats()
+    return jsonify({
+        'status': 'success',
+        'suggestion_cache': {'hit_rate': ai_service.get_suggestion_cache_stats()['hit_rate']},
+        'youtube_quota': {field: quota_status[field]
+                          for field in ('day', 'user_used', 'user_budget', 'user_remaining', 'low')},
+        'write_queue': {'fill': round(write_queue['depth'] / write_queue['max_size'], 3) if write_queue['max_size'] else 0.0}
+    })
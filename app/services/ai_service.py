@@ -1,16 +1,221 @@
 import os
+import json
+import time
+import hashlib
+import threading
+import unicodedata
+from cachetools import TTLCache
 from google import genai
 from google.genai import types
 
-def generate_reply_suggestions(comment_text, examples=None, video_title=None, video_description=None):
+# Gemini request limits shared by every thread in the process
+GEMINI_MAX_CONCURRENCY = int(os.environ.get('GEMINI_MAX_CONCURRENCY', '4'))
+GEMINI_RPM = int(os.environ.get('GEMINI_RPM', '60'))
+
+class RateLimiter:
+    """
+    Caps concurrent calls and spaces them to at most `rpm` starts per minute.
+    Used as a context manager around each API call.
+    """
+    def __init__(self, max_concurrency, rpm):
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._interval = 60.0 / rpm if rpm > 0 else 0
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def __enter__(self):
+        self._slots.acquire()
+        if self._interval:
+            with self._lock:
+                now = time.monotonic()
+                wait_for = self._next_at - now
+                self._next_at = max(now, self._next_at) + self._interval
+            if wait_for > 0:
+                time.sleep(wait_for)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._slots.release()
+        return False
+
+rate_limiter = RateLimiter(GEMINI_MAX_CONCURRENCY, GEMINI_RPM)
+
+MODEL_NAME = 'gemini-2.5-flash-lite' # Stable model
+
+# Comments packed into a single prompt by generate_reply_suggestions_batch
+BATCH_PROMPT_SIZE = int(os.environ.get('GEMINI_BATCH_PROMPT_SIZE', '10'))
+
+INSTRUCTION_TEXT = "フレンドリーで親しみやすい口調で、必ず最後に感謝の意を簡潔に示し、絵文字を1つ付けてください。"
+
+SAFETY_TEXT = """
+    【重要：安全ガイドライン】
+    以下のトピックに関する返信は絶対に生成しないでください。もしコメントがこれらに該当する場合は、無難な挨拶のみ、または返信しないことを提案してください。
+    1. 金融・投資アドバイス（仮想通貨、株など）
+    2. 暴力、ヘイトスピーチ、差別的表現
+    3. 外部サイトへの誘導、URLの記載
+    4. 「チャンネル登録して」などの相互登録依頼（Sub4Sub）
+    5. 個人情報の聞き出し
+"""
+
+PATTERNS_TEXT = """
+    【生成する3つのパターン】
+    1. **共感・感謝型**: 相手のコメントに深く共感し、感謝を伝える（最も丁寧で安全なパターン）。
+    2. **質問・交流型**: 会話を続けるために、関連する質問を投げかける（エンゲージメントを高めるパターン）。
+    3. **短文・ウィット型**: 短く、気の利いた一言やリアクションで返す（親近感を演出するパターン）。
+"""
+
+# Static prompt segments, built once at import time
+_SINGLE_PROMPT_HEAD = """
+    役割: あなたはYouTubeチャンネルの運営者です。
+
+
+    
+    """
+
+_SINGLE_PROMPT_TASK = f"""
+    {SAFETY_TEXT}
+    【今回のタスク】
+    以下の視聴者コメントに対して、学習したスタイル（口調）を維持したまま、アプローチの異なる3つの返信を生成してください。
+
+    視聴者コメント: 「"""
+
+_SINGLE_PROMPT_TAIL = f"""」
+    {PATTERNS_TEXT}
+    【制約事項】
+    - 出力は箇条書き（- ）で3行のみ出力してください。
+    - 各行は「パターン名」を含まず、返信本文のみを記述してください。
+    - 前置きや解説は一切不要です。
+    - 追加指示：{INSTRUCTION_TEXT}
+    """
+
+_BATCH_PROMPT_HEAD = """
+    役割: あなたはYouTubeチャンネルの運営者です。
+
+    """
+
+_BATCH_PROMPT_TASK = f"""
+    {SAFETY_TEXT}
+    【今回のタスク】
+    以下の視聴者コメント（JSON配列）のそれぞれに対して、学習したスタイル（口調）を維持したまま、アプローチの異なる3つの返信を生成してください。
+
+    視聴者コメント: """
+
+_BATCH_PROMPT_TAIL = f"""
+    {PATTERNS_TEXT}
+    【出力形式】
+    - 次の形式のJSONオブジェクトのみを出力してください: {{"c1": ["返信1", "返信2", "返信3"], "c2": [...]}}
+    - 入力のすべての key を含め、各値は返信本文のみ（パターン名なし）の文字列3つの配列にしてください。
+    - 追加指示：{INSTRUCTION_TEXT}
+    """
+
+_GENERATION_CONFIG = types.GenerateContentConfig(
+    temperature=0.7,
+)
+
+_BATCH_GENERATION_CONFIG = types.GenerateContentConfig(
+    temperature=0.7,
+    response_mime_type='application/json',
+)
+
+_client = None
+_client_api_key = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """
+    Returns the process-wide genai.Client (thread-safe), or None if GEMINI_API_KEY is not set.
+    The client is only rebuilt if the key changes.
+    """
+    global _client, _client_api_key
     api_key = os.environ.get('GEMINI_API_KEY')
     if not api_key:
-        return ["Error: GEMINI_API_KEY not set."], None
+        return None
 
-    client = genai.Client(api_key=api_key)
-    
-    instruction_text = "フレンドリーで親しみやすい口調で、必ず最後に感謝の意を簡潔に示し、絵文字を1つ付けてください。"
+    if _client is None or _client_api_key != api_key:
+        with _client_lock:
+            if _client is None or _client_api_key != api_key:
+                _client = genai.Client(api_key=api_key)
+                _client_api_key = api_key
+    return _client
+
+# Suggestion cache: fans repeat the same comments, so identical (normalized) text
+# with the same prompt/examples/video context reuses the previous suggestions
+SUGGESTION_CACHE_TTL_SEC = int(os.environ.get('SUGGESTION_CACHE_TTL_SEC', str(6 * 3600)))
+_suggestion_cache = TTLCache(maxsize=int(os.environ.get('SUGGESTION_CACHE_SIZE', '5000')), ttl=SUGGESTION_CACHE_TTL_SEC)
+_suggestion_cache_lock = threading.Lock()
+_suggestion_cache_stats = {
+    'hits': 0,
+    'misses': 0,
+    'saved_input_tokens': 0,
+    'saved_output_tokens': 0,
+    'saved_seconds': 0.0
+}
+
+# Changes whenever any static prompt text changes, invalidating old cache entries
+_PROMPT_VERSION = hashlib.sha1("".join((
+    _SINGLE_PROMPT_HEAD, _SINGLE_PROMPT_TASK, _SINGLE_PROMPT_TAIL,
+    _BATCH_PROMPT_HEAD, _BATCH_PROMPT_TASK, _BATCH_PROMPT_TAIL, MODEL_NAME
+)).encode('utf-8')).hexdigest()
+
+# Emoji, pictographs, modifiers, joiners and variation selectors are folded away
+_FOLDED_CATEGORIES = {'So', 'Sk', 'Cf', 'Cs', 'Co'}
+
+def normalize_comment_text(text):
+    """
+    NFKC + casefold, drops emoji/symbols and collapses whitespace, so
+    "応援してます🔥" and "応援してます　🔥🔥" share a cache entry.
+    Emoji/symbol-only comments keep their NFKC text instead, so "😢" and "😂"
+    don't collapse into the same empty key.
+    """
+    nfkc = unicodedata.normalize('NFKC', text or '')
+    folded = ''.join(
+        ch for ch in nfkc.casefold()
+        if unicodedata.category(ch) not in _FOLDED_CATEGORIES and not 0xFE00 <= ord(ch) <= 0xFE0F
+    )
+    return ' '.join(folded.split()) or ' '.join(nfkc.split())
+
+def _suggestion_cache_key(user_id, comment_text, examples_text, context_text):
+    if not user_id:
+        return None
+    variant = hashlib.sha1(f"{_PROMPT_VERSION}|{examples_text}|{context_text}".encode('utf-8')).hexdigest()
+    return (user_id, normalize_comment_text(comment_text), variant)
+
+def _get_cached_suggestions(cache_key):
+    """
+    Returns (suggestions, usage) for a cache hit, or None. Hits report zero tokens
+    with usage['cached'] set, so callers can skip logging them.
+    """
+    if cache_key is None:
+        return None
+    with _suggestion_cache_lock:
+        entry = _suggestion_cache.get(cache_key)
+        if entry is None:
+            _suggestion_cache_stats['misses'] += 1
+            return None
+        suggestions, usage, elapsed = entry
+        _suggestion_cache_stats['hits'] += 1
+        if usage:
+            _suggestion_cache_stats['saved_input_tokens'] += usage['input_tokens']
+            _suggestion_cache_stats['saved_output_tokens'] += usage['output_tokens']
+        _suggestion_cache_stats['saved_seconds'] += elapsed
+    return list(suggestions), {'input_tokens': 0, 'output_tokens': 0, 'model_name': MODEL_NAME, 'cached': True}
+
+def _store_suggestions(cache_key, suggestions, usage, elapsed):
+    if cache_key is None or not suggestions:
+        return
+    with _suggestion_cache_lock:
+        _suggestion_cache[cache_key] = (tuple(suggestions), usage, elapsed)
 
+def get_suggestion_cache_stats():
+    with _suggestion_cache_lock:
+        stats = dict(_suggestion_cache_stats)
+        stats['size'] = len(_suggestion_cache)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+    stats['saved_seconds'] = round(stats['saved_seconds'], 2)
+    return stats
+
+def _build_examples_text(examples):
     # Construct Few-Shot Examples with Strong Instruction
     examples_text = ""
     if examples:
@@ -19,6 +224,9 @@ def generate_reply_suggestions(comment_text, examples=None, video_title=None, vi
         examples_text += "    内容は今回のコメントに合わせて変えますが、**「話し方の癖」はこれらを完全にコピー**してください。\n\n"
         for i, ex in enumerate(examples, 1):
             examples_text += f"    データ{i}:\n    視聴者: {ex['input']}\n    あなた: {ex['output']}\n\n"
+    return examples_text
+
+def _build_context_text(video_title, video_description):
     # Construct Video Context
     context_text = ""
     if video_title:
@@ -27,49 +235,44 @@ def generate_reply_suggestions(comment_text, examples=None, video_title=None, vi
             # Truncate description to 300 chars
             desc_short = (video_description[:300] + '...') if len(video_description) > 300 else video_description
             context_text += f"    概要: {desc_short}\n"
+    return context_text
 
-    prompt = f"""
-    役割: あなたはYouTubeチャンネルの運営者です。
-
-
-    
-    {context_text}
-    
-    {examples_text}
-    
-    【重要：安全ガイドライン】
-    以下のトピックに関する返信は絶対に生成しないでください。もしコメントがこれらに該当する場合は、無難な挨拶のみ、または返信しないことを提案してください。
-    1. 金融・投資アドバイス（仮想通貨、株など）
-    2. 暴力、ヘイトスピーチ、差別的表現
-    3. 外部サイトへの誘導、URLの記載
-    4. 「チャンネル登録して」などの相互登録依頼（Sub4Sub）
-    5. 個人情報の聞き出し
+def generate_reply_suggestions(comment_text, examples=None, video_title=None, video_description=None, user_id=None, refresh=False):
+    """
+    Returns (suggestions, usage). Passing user_id enables the suggestion cache;
+    refresh=True (regenerate) skips the lookup but still stores the new result.
+    """
+    client = get_client()
+    if client is None:
+        return ["Error: GEMINI_API_KEY not set."], None
 
-    【今回のタスク】
-    以下の視聴者コメントに対して、学習したスタイル（口調）を維持したまま、アプローチの異なる3つの返信を生成してください。
+    examples_text = _build_examples_text(examples)
+    context_text = _build_context_text(video_title, video_description)
 
-    視聴者コメント: 「{comment_text}」
-    
-    【生成する3つのパターン】
-    1. **共感・感謝型**: 相手のコメントに深く共感し、感謝を伝える（最も丁寧で安全なパターン）。
-    2. **質問・交流型**: 会話を続けるために、関連する質問を投げかける（エンゲージメントを高めるパターン）。
-    3. **短文・ウィット型**: 短く、気の利いた一言やリアクションで返す（親近感を演出するパターン）。
+    cache_key = _suggestion_cache_key(user_id, comment_text, examples_text, context_text)
+    cached = None if refresh else _get_cached_suggestions(cache_key)
+    if cached is not None:
+        return cached
+    return _generate_single(client, comment_text, examples_text, context_text, cache_key)
 
-    【制約事項】
-    - 出力は箇条書き（- ）で3行のみ出力してください。
-    - 各行は「パターン名」を含まず、返信本文のみを記述してください。
-    - 前置きや解説は一切不要です。
-    - 追加指示：{instruction_text}
+def _generate_single(client, comment_text, examples_text, context_text, cache_key):
+    """
+    One model call for one comment, after the cache lookup (stores the result under cache_key).
     """
+    # Only the variable parts are formatted per request
+    prompt = "".join((
+        _SINGLE_PROMPT_HEAD, context_text, "\n    \n    ", examples_text,
+        _SINGLE_PROMPT_TASK, comment_text, _SINGLE_PROMPT_TAIL
+    ))
 
     try:
-        response = client.models.generate_content(
-            model='gemini-2.5-flash-lite', # Stable model
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                temperature=0.7,
+        started = time.monotonic()
+        with rate_limiter:
+            response = client.models.generate_content(
+                model=MODEL_NAME,
+                contents=prompt,
+                config=_GENERATION_CONFIG
             )
-        )
         
         text = response.text
         # Parse bullet points
@@ -82,16 +285,141 @@ def generate_reply_suggestions(comment_text, examples=None, video_title=None, vi
         usage = {
             'input_tokens': response.usage_metadata.prompt_token_count,
             'output_tokens': response.usage_metadata.candidates_token_count,
-            'model_name': 'gemini-2.5-flash-lite'
+            'model_name': MODEL_NAME
         }
-            
+
+        _store_suggestions(cache_key, suggestions[:3], usage, time.monotonic() - started)
         return suggestions[:3], usage
         
     except Exception as e:
         print(f"Gemini API Error: {e}")
         return [f"Error generating reply: {str(e)}"], None
 
+def _parse_batch_response(text, keys):
+    """
+    Returns {key: [suggestions]} for every key whose entry in the JSON response is valid.
+    Missing or malformed entries are left out so the caller can retry them one by one.
+    """
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError):
+        return {}
+    if not isinstance(data, dict):
+        return {}
+
+    parsed = {}
+    for key in keys:
+        value = data.get(key)
+        if not isinstance(value, list):
+            continue
+        suggestions = [v.strip() for v in value if isinstance(v, str) and v.strip()]
+        if suggestions:
+            parsed[key] = suggestions[:3]
+    return parsed
+
+def _split_usage(usage, weights):
+    """
+    Splits a usage dict across items: input tokens evenly (the shared prompt dominates),
+    output tokens in proportion to each item's generated text length.
+    """
+    count = len(weights)
+    total_weight = sum(weights)
+    if not total_weight:
+        # Nothing usable was generated: split output tokens evenly as well
+        weights = [1] * count
+        total_weight = count
+
+    shares = []
+    for i, weight in enumerate(weights):
+        shares.append({
+            'input_tokens': usage['input_tokens'] // count + (1 if i < usage['input_tokens'] % count else 0),
+            'output_tokens': usage['output_tokens'] * weight // total_weight,
+            'model_name': usage['model_name']
+        })
+    return shares
+
+def generate_reply_suggestions_batch(comments, examples=None, video_title=None, video_description=None, user_id=None):
+    """
+    Generates suggestions for several comments with a single prompt.
+    comments: list of {'id', 'text'}.
+    Returns {comment_id: (suggestions, usage)} in the same shape as generate_reply_suggestions.
+    Cached comments are answered without calling the model, comments the model
+    answered with invalid JSON fall back to a per-comment call, and the batch's
+    token usage is split across the comments it covered.
+    """
+    if not comments:
+        return {}
+
+    client = get_client()
+    if client is None:
+        return {c['id']: (["Error: GEMINI_API_KEY not set."], None) for c in comments}
+
+    examples_text = _build_examples_text(examples)
+    context_text = _build_context_text(video_title, video_description)
+
+    results = {}
+    pending = []
+    for comment in comments:
+        cache_key = _suggestion_cache_key(user_id, comment['text'], examples_text, context_text)
+        cached = _get_cached_suggestions(cache_key)
+        if cached is not None:
+            results[comment['id']] = cached
+        else:
+            pending.append((comment, cache_key))
+
+    if not pending:
+        return results
+    if len(pending) == 1:
+        comment, cache_key = pending[0]
+        results[comment['id']] = _generate_single(client, comment['text'], examples_text, context_text, cache_key)
+        return results
 
+    # Short local keys: the model copies these back far more reliably than YouTube IDs
+    keyed = {f"c{i}": item for i, item in enumerate(pending, 1)}
+    comments_json = json.dumps([{'key': k, 'text': c['text']} for k, (c, _) in keyed.items()], ensure_ascii=False)
+
+    prompt = "".join((
+        _BATCH_PROMPT_HEAD, context_text, "\n    \n    ", examples_text,
+        _BATCH_PROMPT_TASK, comments_json, _BATCH_PROMPT_TAIL
+    ))
+
+    parsed = {}
+    usage = None
+    started = time.monotonic()
+    try:
+        with rate_limiter:
+            response = client.models.generate_content(
+                model=MODEL_NAME,
+                contents=prompt,
+                config=_BATCH_GENERATION_CONFIG
+            )
+        parsed = _parse_batch_response(response.text, keyed.keys())
+        usage = {
+            'input_tokens': response.usage_metadata.prompt_token_count or 0,
+            'output_tokens': response.usage_metadata.candidates_token_count or 0,
+            'model_name': MODEL_NAME
+        }
+    except Exception as e:
+        print(f"Gemini API Error (batch): {e}")
+    elapsed_per_comment = (time.monotonic() - started) / len(keyed)
 
+    # Attribute the batch call's tokens to every comment it was sent for
+    weights = [sum(len(s) for s in parsed.get(k, [])) for k in keyed]
+    shares = _split_usage(usage, weights) if usage else [None] * len(keyed)
 
+    for (key, (comment, cache_key)), share in zip(keyed.items(), shares):
+        if key in parsed:
+            _store_suggestions(cache_key, parsed[key], share, elapsed_per_comment)
+            results[comment['id']] = (parsed[key], share)
+            continue
 
+        print(f"[WARN] Batch response missing/invalid for comment {comment['id']}. Falling back to single call.")
+        suggestions, single_usage = _generate_single(client, comment['text'], examples_text, context_text, cache_key)
+        if share and single_usage:
+            single_usage = {
+                'input_tokens': single_usage['input_tokens'] + share['input_tokens'],
+                'output_tokens': single_usage['output_tokens'] + share['output_tokens'],
+                'model_name': MODEL_NAME
+            }
+        results[comment['id']] = (suggestions, single_usage)
+    return results
@@ -0,0 +1,107 @@
+"""
+Compact comment/reply records.
+
+Processed comment threads are kept by the tens of thousands (comment pages,
+bulk actions, the local store), so they use __slots__ instead of per-record
+dicts, and repeated strings (author names and avatars, video ids) are interned
+so every record of the same author shares one copy. to_dict() builds the plain
+dict only when a template, JSON response or the store needs it.
+
+Records still support record['field'] access for code written against the dicts.
+"""
+import sys
+
+_intern = sys.intern
+
+
+class _Record:
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f"{type(self).__name__}(id={self.id!r})"
+
+
+class Reply(_Record):
+    __slots__ = ('id', 'text', 'author_name', 'author_image', 'published_at', 'updated_at',
+                 'like_count', 'video_id', 'is_mine')
+
+    def __init__(self, id, text, author_name, author_image, published_at, updated_at,
+                 like_count, video_id, is_mine):
+        self.id = id
+        self.text = text
+        self.author_name = _intern(author_name)
+        self.author_image = _intern(author_image)
+        self.published_at = published_at
+        self.updated_at = updated_at
+        self.like_count = like_count
+        self.video_id = _intern(video_id)
+        self.is_mine = is_mine
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data['id'], data['text'], data['author_name'], data['author_image'],
+            data['published_at'], data.get('updated_at', data['published_at']),
+            data.get('like_count', 0), data.get('video_id', ''), data.get('is_mine', False)
+        )
+
+
+class Comment(_Record):
+    __slots__ = ('id', 'text', 'author_name', 'author_image', 'published_at', 'updated_at',
+                 'like_count', 'viewer_rating', 'reply_count', 'video_id', 'is_replied',
+                 'replies', 'is_edited', 'is_manually_completed')
+
+    def __init__(self, id, text, author_name, author_image, published_at, updated_at,
+                 like_count, viewer_rating, reply_count, video_id, is_replied, replies,
+                 is_manually_completed=False):
+        self.id = id
+        self.text = text
+        self.author_name = _intern(author_name)
+        self.author_image = _intern(author_image)
+        self.published_at = published_at
+        self.updated_at = updated_at
+        self.like_count = like_count
+        self.viewer_rating = _intern(viewer_rating)
+        self.reply_count = reply_count
+        self.video_id = _intern(video_id)
+        self.is_replied = is_replied
+        # Tuples (and one shared empty tuple) instead of per-record lists
+        self.replies = tuple(replies) if replies else ()
+        self.is_edited = updated_at != published_at
+        self.is_manually_completed = is_manually_completed
+
+    @classmethod
+    def from_dict(cls, data):
+        published_at = data['published_at']
+        comment = cls(
+            data['id'], data['text'], data['author_name'], data['author_image'],
+            published_at, data.get('updated_at', published_at),
+            data.get('like_count', 0), data.get('viewer_rating', 'none'),
+            data.get('reply_count', len(data.get('replies', []))), data.get('video_id', ''),
+            data.get('is_replied', False),
+            [Reply.from_dict(reply) for reply in data.get('replies', [])],
+            data.get('is_manually_completed', False)
+        )
+        if 'is_edited' in data:
+            comment.is_edited = data['is_edited']
+        return comment
+
+    def to_dict(self):
+        data = super().to_dict()
+        data['replies'] = [reply.to_dict() for reply in self.replies]
+        return data
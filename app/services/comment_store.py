@@ -0,0 +1,221 @@
+"""
+Local comment-thread store (SQLite).
+
+Keeps the processed comment records of each (user_id, video_id) so that
+youtube_service only has to fetch the newest pages on refresh instead of
+re-crawling every comment thread of a video.
+"""
+import os
+import json
+import sqlite3
+import threading
+import time
+
+from app.services.comment_records import Comment
+
+DEFAULT_STORE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    'instance', 'comment_store.sqlite3'
+)
+STORE_PATH = os.environ.get('COMMENT_STORE_PATH', DEFAULT_STORE_PATH)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS comment_threads (
+    user_id TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    thread_id TEXT NOT NULL,
+    updated_at TEXT,
+    reply_count INTEGER,
+    published_at TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (user_id, video_id, thread_id)
+);
+CREATE INDEX IF NOT EXISTS idx_comment_threads_thread ON comment_threads(user_id, thread_id);
+CREATE TABLE IF NOT EXISTS comment_snapshots (
+    user_id TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    is_complete INTEGER NOT NULL DEFAULT 0,
+    synced_at REAL NOT NULL,
+    full_synced_at REAL NOT NULL,
+    PRIMARY KEY (user_id, video_id)
+);
+"""
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = False
+
+
+def _get_conn():
+    """Returns this thread's connection (SQLite connections can't be shared across threads)."""
+    global _initialized
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        os.makedirs(os.path.dirname(STORE_PATH), exist_ok=True)
+        conn = sqlite3.connect(STORE_PATH, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with _init_lock:
+            if not _initialized:
+                conn.executescript(_SCHEMA)
+                _initialized = True
+        _local.conn = conn
+    return conn
+
+
+def get_snapshot_meta(user_id, video_id):
+    """
+    Returns {'is_complete', 'synced_at', 'full_synced_at'} for a stored video, or None.
+    """
+    row = _get_conn().execute(
+        "SELECT is_complete, synced_at, full_synced_at FROM comment_snapshots WHERE user_id = ? AND video_id = ?",
+        (user_id, video_id)
+    ).fetchone()
+    if not row:
+        return None
+    return {'is_complete': bool(row[0]), 'synced_at': row[1], 'full_synced_at': row[2]}
+
+
+def get_known_threads(user_id, video_id):
+    """
+    Returns {thread_id: (updated_at, reply_count)} used to detect where an incremental refresh can stop.
+    """
+    rows = _get_conn().execute(
+        "SELECT thread_id, updated_at, reply_count FROM comment_threads WHERE user_id = ? AND video_id = ?",
+        (user_id, video_id)
+    )
+    return {thread_id: (updated_at, reply_count) for thread_id, updated_at, reply_count in rows}
+
+
+def iter_threads(user_id, video_id):
+    """
+    Yields the stored Comment records of a video, newest first (decoded one row at a time).
+    """
+    rows = _get_conn().execute(
+        "SELECT data FROM comment_threads WHERE user_id = ? AND video_id = ? ORDER BY published_at DESC",
+        (user_id, video_id)
+    )
+    for (data,) in rows:
+        yield Comment.from_dict(json.loads(data))
+
+
+def iter_thread_keys(user_id, video_id):
+    """
+    Iterates (thread_id, is_replied, published_at, like_count) over the stored threads
+    of a video (newest first), without decoding the stored records (used to filter and paginate).
+    """
+    return _get_conn().execute(
+        "SELECT thread_id, json_extract(data, '$.is_replied'), published_at, json_extract(data, '$.like_count') "
+        "FROM comment_threads WHERE user_id = ? AND video_id = ? ORDER BY published_at DESC",
+        (user_id, video_id)
+    )
+
+
+def load_threads_by_id(user_id, video_id, thread_ids):
+    """
+    Returns the stored Comment records for thread_ids, in the given order.
+    """
+    if not thread_ids:
+        return []
+    placeholders = ','.join('?' * len(thread_ids))
+    rows = _get_conn().execute(
+        f"SELECT thread_id, data FROM comment_threads WHERE user_id = ? AND video_id = ? AND thread_id IN ({placeholders})",
+        (user_id, video_id, *thread_ids)
+    )
+    by_id = {thread_id: data for thread_id, data in rows}
+    return [Comment.from_dict(json.loads(by_id[thread_id])) for thread_id in thread_ids if thread_id in by_id]
+
+
+def _thread_rows(user_id, video_id, records):
+    for record in records:
+        yield (
+            user_id, video_id, record.id,
+            record.updated_at, record.reply_count, record.published_at,
+            json.dumps(record.to_dict(), ensure_ascii=False)
+        )
+
+
+def save_threads(user_id, video_id, records, is_complete=True):
+    """
+    Upserts fetched records into an existing snapshot (incremental refresh).
+    is_complete is False when the refresh stopped before reaching known threads,
+    which leaves a gap that the next read has to close with a full crawl.
+    """
+    now = time.time()
+    conn = _get_conn()
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO comment_threads "
+            "(user_id, video_id, thread_id, updated_at, reply_count, published_at, data) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            _thread_rows(user_id, video_id, records)
+        )
+        conn.execute(
+            "UPDATE comment_snapshots SET synced_at = ?, is_complete = ? WHERE user_id = ? AND video_id = ?",
+            (now, int(is_complete), user_id, video_id)
+        )
+
+
+def put_threads(user_id, video_id, records):
+    """
+    Upserts one page of records of a full crawl as it arrives (see finish_full_sync).
+    """
+    conn = _get_conn()
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO comment_threads "
+            "(user_id, video_id, thread_id, updated_at, reply_count, published_at, data) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            _thread_rows(user_id, video_id, records)
+        )
+
+
+def finish_full_sync(user_id, video_id, seen_thread_ids, is_complete):
+    """
+    Ends a full crawl written with put_threads: drops stored threads the crawl didn't
+    see and records the snapshot. is_complete is False when the crawl was cut short
+    (e.g. by max_pages), in which case unseen threads are kept.
+    """
+    now = time.time()
+    conn = _get_conn()
+    with conn:
+        if is_complete:
+            stale = [
+                (user_id, video_id, thread_id)
+                for (thread_id,) in conn.execute(
+                    "SELECT thread_id FROM comment_threads WHERE user_id = ? AND video_id = ?", (user_id, video_id)
+                ).fetchall()
+                if thread_id not in seen_thread_ids
+            ]
+            conn.executemany(
+                "DELETE FROM comment_threads WHERE user_id = ? AND video_id = ? AND thread_id = ?", stale
+            )
+        conn.execute(
+            "INSERT OR REPLACE INTO comment_snapshots (user_id, video_id, is_complete, synced_at, full_synced_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (user_id, video_id, int(is_complete), now, now)
+        )
+
+
+def find_thread(user_id, thread_id):
+    """
+    Returns (video_id, Comment) for a stored thread, or None.
+    """
+    row = _get_conn().execute(
+        "SELECT video_id, data FROM comment_threads WHERE user_id = ? AND thread_id = ?",
+        (user_id, thread_id)
+    ).fetchone()
+    if not row:
+        return None
+    return row[0], Comment.from_dict(json.loads(row[1]))
+
+
+def put_thread(user_id, video_id, record):
+    """
+    Writes back a single record changed locally (e.g. after posting a reply).
+    """
+    put_threads(user_id, video_id, [record])
+
+
+def delete_thread(user_id, thread_id):
+    conn = _get_conn()
+    with conn:
+        conn.execute("DELETE FROM comment_threads WHERE user_id = ? AND thread_id = ?", (user_id, thread_id))
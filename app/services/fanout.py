@@ -0,0 +1,174 @@
+"""
+Bounded-concurrency fan-out for per-video API work.
+
+Jobs run on process-wide thread pools, and each user has at most
+PER_USER_CONCURRENCY jobs on a pool at a time: further jobs wait in that user's
+queue (not on a pool thread) until one of theirs finishes, so a heavy channel
+cannot starve the other gunicorn threads. Work that can wait on something else
+for long runs on its own pool, so it can't take the workers of the per-video API
+fan-outs: AI_POOL for Gemini generation (which queues on ai_service's rate
+limiter) and submit() for background syncs and index builds.
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+MAX_WORKERS = int(os.environ.get('FANOUT_MAX_WORKERS', '16'))
+AI_MAX_WORKERS = int(os.environ.get('FANOUT_AI_WORKERS', '8'))
+BACKGROUND_MAX_WORKERS = int(os.environ.get('FANOUT_BACKGROUND_WORKERS', '4'))
+PER_USER_CONCURRENCY = int(os.environ.get('FANOUT_PER_USER', '6'))
+DEFAULT_DEADLINE_SEC = float(os.environ.get('FANOUT_DEADLINE_SEC', '20'))
+
+API_POOL = 'api'
+AI_POOL = 'ai'
+_executors = {
+    API_POOL: ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='fanout'),
+    AI_POOL: ThreadPoolExecutor(max_workers=AI_MAX_WORKERS, thread_name_prefix='fanout-ai'),
+}
+_background_executor = ThreadPoolExecutor(max_workers=BACKGROUND_MAX_WORKERS, thread_name_prefix='fanout-bg')
+
+# (pool, user_id) -> [running job count, deque of parked (future, expires_at, key, fn, args)]
+_user_queues = {}
+_user_queues_lock = threading.Lock()
+
+
+def _run_job(queue_key, future, expires_at, key, fn, args):
+    try:
+        if not future.set_running_or_notify_cancel():
+            return
+        if expires_at is not None and time.monotonic() > expires_at:
+            future.set_exception(TimeoutError(f"Deadline reached before job {key} could start"))
+            return
+        try:
+            result = fn(*args)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+    finally:
+        _release(queue_key)
+
+
+def _release(queue_key):
+    """Hands the finished job's slot to the user's next parked job, if any."""
+    with _user_queues_lock:
+        state = _user_queues[queue_key]
+        parked = state[1]
+        while parked:
+            job = parked.popleft()
+            if not job[0].cancelled():
+                _executors[queue_key[0]].submit(_run_job, queue_key, *job)
+                return
+        state[0] -= 1
+        if not state[0]:
+            del _user_queues[queue_key]
+
+
+def _submit_for_user(pool, user_id, expires_at, key, fn, args):
+    """
+    Returns a Future for fn(*args). The job goes to the pool right away if the
+    user has a free slot on it, otherwise it is parked until one of theirs finishes.
+    """
+    future = Future()
+    job = (future, expires_at, key, fn, args)
+    queue_key = (pool, user_id)
+    with _user_queues_lock:
+        state = _user_queues.setdefault(queue_key, [0, deque()])
+        if state[0] < PER_USER_CONCURRENCY:
+            state[0] += 1
+            _executors[pool].submit(_run_job, queue_key, *job)
+        else:
+            state[1].append(job)
+    return future
+
+
+class Batch:
+    """
+    Jobs of one user submitted over time (e.g. one per API page as it arrives)
+    that share the per-user slots of one pool and a single deadline.
+    """
+
+    def __init__(self, user_id, deadline=DEFAULT_DEADLINE_SEC, pool=API_POOL):
+        self._user_id = user_id
+        self._pool = pool
+        self._deadline = deadline
+        self._expires_at = time.monotonic() + deadline if deadline else None
+        self._pending = {}
+
+    def submit(self, key, fn, *args):
+        """Schedules fn(*args); its outcome is reported under key."""
+        future = _submit_for_user(self._pool, self._user_id, self._expires_at, key, fn, args)
+        self._pending[future] = key
+
+    def iter_completed(self, wait_running=False):
+        """
+        Yields (key, result, error) as submitted jobs finish. When the deadline passes,
+        jobs that haven't started are dropped and yielded with a TimeoutError. Jobs
+        already running are yielded with a TimeoutError too (they finish in the
+        background and their results are discarded), unless wait_running is set:
+        then they are waited for and reported with their real outcome, for jobs with
+        side effects such as posting a reply.
+        """
+        pending = self._pending
+        try:
+            while pending:
+                timeout = None if self._expires_at is None else max(0.0, self._expires_at - time.monotonic())
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+                if not done:
+                    # Deadline reached: give up on whatever is left (that can be given up)
+                    for future, key in list(pending.items()):
+                        if future.cancel() or not wait_running:
+                            pending.pop(future)
+                            yield key, None, TimeoutError(f"Job {key} missed the {self._deadline}s deadline")
+                    self._expires_at = None
+                    continue
+
+                for future in done:
+                    key = pending.pop(future)
+                    try:
+                        yield key, future.result(), None
+                    except Exception as e:
+                        yield key, None, e
+        finally:
+            # The consumer stopped early (e.g. a client disconnected from a stream):
+            # drop the jobs that haven't started
+            for future in pending:
+                future.cancel()
+
+
+def iter_completed(user_id, fn, keys, deadline=DEFAULT_DEADLINE_SEC, wait_running=False, pool=API_POOL):
+    """
+    Runs fn(key) for every key and yields (key, result, error) as jobs finish.
+    Jobs still unfinished when the deadline passes are yielded with a TimeoutError
+    (see Batch.iter_completed for wait_running).
+    """
+    batch = Batch(user_id, deadline, pool)
+    for key in keys:
+        batch.submit(key, fn, key)
+    return batch.iter_completed(wait_running=wait_running)
+
+
+def fan_out(user_id, fn, keys, deadline=DEFAULT_DEADLINE_SEC, pool=API_POOL):
+    """
+    Runs fn(key) for every key in parallel and waits for all of them (or the deadline).
+    Returns (results, errors): dicts keyed by key. Keys that failed or timed out
+    only appear in errors, so callers can render partial results.
+    """
+    results = {}
+    errors = {}
+    for key, result, error in iter_completed(user_id, fn, keys, deadline, pool=pool):
+        if error is None:
+            results[key] = result
+        else:
+            errors[key] = error
+    return results, errors
+
+
+def submit(fn, *args):
+    """
+    Runs fn(*args) on the background pool (no per-user slot or deadline).
+    """
+    return _background_executor.submit(fn, *args)
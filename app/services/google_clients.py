@@ -0,0 +1,173 @@
+"""
+Factory for googleapiclient service objects.
+
+Every request built by these services is charged against the YouTube quota
+budget (see quota.py) before it is sent.
+
+Discovery documents are parsed once per process, and built services are pooled
+per user so their authorized httplib2 connection (keep-alive) is reused across
+calls. httplib2 is not thread-safe, so each thread keeps its own pool; entries
+are keyed by a fingerprint of the stored tokens, which rebuilds the client as
+soon as the user's tokens change.
+"""
+import os
+import json
+import hashlib
+import threading
+
+import httplib2
+import google_auth_httplib2
+from cachetools import LRUCache
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest
+
+from app.services import auth
+from app.services import quota
+
+# Built clients kept per thread (LRU)
+POOL_SIZE = int(os.environ.get('GOOGLE_CLIENT_POOL_SIZE', '32'))
+HTTP_TIMEOUT_SEC = int(os.environ.get('GOOGLE_HTTP_TIMEOUT_SEC', '60'))
+# Calls sent per multipart batch exchange (execute_batch)
+BATCH_MAX_REQUESTS = int(os.environ.get('GOOGLE_BATCH_MAX_REQUESTS', '50'))
+
+_discovery_docs = {}
+_discovery_lock = threading.Lock()
+_local = threading.local()
+
+
+def _get_discovery_doc(api, version):
+    key = (api, version)
+    doc = _discovery_docs.get(key)
+    if doc is None:
+        with _discovery_lock:
+            doc = _discovery_docs.get(key)
+            if doc is None:
+                content = discovery_cache.get_static_doc(api, version)
+                doc = json.loads(content) if content else False
+                _discovery_docs[key] = doc
+    return doc
+
+
+def _is_quota_exceeded(e):
+    return isinstance(e, HttpError) and e.resp.status == 403 and 'quotaExceeded' in str(e)
+
+
+class QuotaHttpRequest(HttpRequest):
+    """
+    HttpRequest that charges its quota cost to its user before it is sent.
+    """
+    user_id = None
+
+    def charge(self):
+        quota.charge(self.user_id, self.methodId)
+
+    def execute(self, http=None, num_retries=0):
+        self.charge()
+        try:
+            return super().execute(http=http, num_retries=num_retries)
+        except HttpError as e:
+            if _is_quota_exceeded(e):
+                quota.mark_exhausted()
+            raise
+
+
+def _request_builder(user_id):
+    def build_request(*args, **kwargs):
+        request = QuotaHttpRequest(*args, **kwargs)
+        request.user_id = user_id
+        return request
+    return build_request
+
+
+def build_client(api, version, creds, user_id=None):
+    """
+    Builds a service object from the cached discovery document (not pooled).
+    Its requests are charged to user_id (only the global budget if None).
+    """
+    http = google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http(timeout=HTTP_TIMEOUT_SEC))
+    request_builder = _request_builder(user_id)
+    doc = _get_discovery_doc(api, version)
+    if not doc:
+        # No static document shipped for this API: let googleapiclient fetch it
+        return build(api, version, http=http, requestBuilder=request_builder)
+    return build_from_document(doc, http=http, requestBuilder=request_builder)
+
+
+def _token_fingerprint(user):
+    raw = f"{user.get('access_token')}|{user.get('refresh_token')}|{user.get('token_expiry')}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def get_client(user_id, user, api, version):
+    """
+    Returns this thread's pooled client for (user_id, api, version), rebuilding it
+    if the user's stored tokens have changed since it was built.
+    """
+    pool = getattr(_local, 'pool', None)
+    if pool is None:
+        pool = _local.pool = LRUCache(maxsize=POOL_SIZE)
+
+    key = (user_id, api, version)
+    fingerprint = _token_fingerprint(user)
+    entry = pool.get(key)
+    if entry and entry[0] == fingerprint:
+        return entry[1]
+
+    client = build_client(api, version, auth.get_credentials_from_user(user), user_id=user_id)
+    pool[key] = (fingerprint, client)
+    return client
+
+
+def execute_batch(service, requests):
+    """
+    Sends {key: HttpRequest} built from 'service' as multipart batch requests
+    (BATCH_MAX_REQUESTS calls per HTTP exchange) instead of one round trip each.
+    Returns (results, errors): dicts keyed by key, like fanout.fan_out. Each call's
+    own error (e.g. an HttpError for one video) is reported under its key; if a
+    whole exchange fails, every key in it gets that error.
+    """
+    results = {}
+    errors = {}
+    items = list(requests.items())
+    for start in range(0, len(items), BATCH_MAX_REQUESTS):
+        chunk = items[start:start + BATCH_MAX_REQUESTS]
+        if len(chunk) == 1:
+            key, request = chunk[0]
+            try:
+                results[key] = request.execute()
+            except Exception as e:
+                errors[key] = e
+            continue
+
+        def callback(request_id, response, exception, chunk=chunk):
+            key = chunk[int(request_id)][0]
+            if exception is not None:
+                if _is_quota_exceeded(exception):
+                    quota.mark_exhausted()
+                errors[key] = exception
+            else:
+                results[key] = response
+
+        # Batched calls bypass HttpRequest.execute, so they are charged here
+        batch = service.new_batch_http_request(callback=callback)
+        added = 0
+        for index, (key, request) in enumerate(chunk):
+            try:
+                if isinstance(request, QuotaHttpRequest):
+                    request.charge()
+            except quota.QuotaExhausted as e:
+                errors[key] = e
+                continue
+            batch.add(request, request_id=str(index))
+            added += 1
+        if not added:
+            continue
+        try:
+            batch.execute()
+        except Exception as e:
+            for key, _ in chunk:
+                if key not in results and key not in errors:
+                    errors[key] = e
+    return results, errors
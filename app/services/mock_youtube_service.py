@@ -1,5 +1,9 @@
 import random
 from datetime import datetime, timedelta
+from app.services.comment_records import Comment
+
+def store_channel_metadata(user_id, channel):
+    return None
 
 def get_channel_info(user_id):
     return {
@@ -115,13 +119,39 @@ def get_video_comments(user_id, video_id, sort_by='date_desc'):
         }
     }
 
+def get_comments_page(user_id, video_id, filter_by='unreplied', sort_by='date_desc', cursor=None, limit=50):
+    data = get_video_comments(user_id, video_id, sort_by)
+    comments = []
+    for c in data['comments']:
+        c.setdefault('is_manually_completed', False)
+        if filter_by == 'unreplied' and (c['is_replied'] or c['is_manually_completed']):
+            continue
+        if filter_by == 'pending' and not c['is_manually_completed']:
+            continue
+        if filter_by == 'replied' and not c['is_replied']:
+            continue
+        comments.append(c)
+
+    offset = int(cursor[2:]) if cursor and cursor.startswith('s:') else 0
+    next_cursor = f"s:{offset + limit}" if offset + limit < len(comments) else None
+    stats = dict(data['stats'], pending=0)
+    page = [Comment.from_dict(c) for c in comments[offset:offset + limit]]
+    return {'comments': page, 'next_cursor': next_cursor, 'stats': stats}
+
 def get_video_details(user_id, video_id):
     return {
         'id': video_id,
         'title': f"Mock Video Title for {video_id}",
-        'thumbnail': f"https://picsum.photos/seed/{video_id}/320/180"
+        'thumbnail': f"https://picsum.photos/seed/{video_id}/320/180",
+        'description': "これはモック動画の概要欄です。"
     }
 
+def get_reply_stats_map(user_id, video_ids, deadline=None, refresh=False, max_pages=None):
+    return {video_id: get_video_comments(user_id, video_id)['stats'] for video_id in video_ids}
+
+def invalidate_reply_stats(user_id, video_id=None):
+    return
+
 def get_aggregated_reply_stats(user_id, limit=5):
     return {
         'total': 100,
@@ -130,7 +160,7 @@ def get_aggregated_reply_stats(user_id, limit=5):
         'rate': 10
     }
 
-def post_reply(user_id, parent_id, text):
+def post_reply(user_id, parent_id, text, video_id=None):
     print(f"[MOCK] Posted reply to {parent_id}: {text}")
     return {
         'id': f"mock_reply_{random.randint(1000,9999)}",
@@ -142,7 +172,11 @@ def post_reply(user_id, parent_id, text):
         }
     }
 
-def delete_comment(user_id, comment_id):
+def post_replies(user_id, replies, deadline=120):
+    for parent_id, text in replies.items():
+        yield parent_id, post_reply(user_id, parent_id, text), None
+
+def delete_comment(user_id, comment_id, video_id=None):
     print(f"[MOCK] Deleted comment {comment_id}")
     return
 
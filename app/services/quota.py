@@ -0,0 +1,166 @@
+"""
+YouTube Data API quota accounting.
+
+Every request built by google_clients is charged its unit cost here before it is
+sent. Usage is tracked per user and for the whole project against a daily project
+budget (and an optional per-user one) that resets at midnight Pacific time, like
+the API's own quota. When the budget runs low, youtube_service switches to cheaper
+behaviour (cached snapshots, fewer pages, no analytics); once it is spent, requests
+fail fast with QuotaExhausted instead of reaching YouTube and coming back with 403
+quotaExceeded. The per-user budget never blocks writes such as posting a reply.
+
+Counters are kept in process memory (one gunicorn worker), so a separate
+run_worker.py process keeps its own.
+"""
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+try:
+    from zoneinfo import ZoneInfo
+    _PACIFIC = ZoneInfo('America/Los_Angeles')
+except Exception:
+    # No tz database in the image: fall back to PST
+    _PACIFIC = timezone(timedelta(hours=-8))
+
+# Project-wide daily quota (the API default is 10,000 units) and an optional per-user
+# share (0 = off). The per-user budget is soft: it degrades and blocks reads, but
+# writes (posting replies etc.) are only blocked by the project budget
+DAILY_BUDGET = int(os.environ.get('YOUTUBE_QUOTA_DAILY', '10000'))
+USER_DAILY_BUDGET = int(os.environ.get('YOUTUBE_QUOTA_USER_DAILY', '0'))
+# Below this share of either budget, callers degrade to cheaper behaviour
+LOW_RATIO = float(os.environ.get('YOUTUBE_QUOTA_LOW_RATIO', '0.2'))
+# commentThreads pages per crawl while the budget is low
+LOW_MAX_PAGES = int(os.environ.get('YOUTUBE_QUOTA_LOW_MAX_PAGES', '2'))
+
+# Unit costs of the YouTube Data API methods we call (other APIs are not charged)
+LIST_COST = 1
+WRITE_COST = 50
+METHOD_COSTS = {
+    'youtube.search.list': 100,
+    'youtube.videos.insert': 1600,
+}
+
+
+class QuotaExhausted(Exception):
+    """Raised instead of sending a request that the remaining budget can't cover."""
+
+
+_lock = threading.Lock()
+_day = None
+_global_used = 0
+_user_used = {}
+
+
+def method_cost(method_id):
+    if not method_id or not method_id.startswith('youtube.'):
+        return 0
+    if method_id in METHOD_COSTS:
+        return METHOD_COSTS[method_id]
+    return LIST_COST if method_id.endswith('.list') else WRITE_COST
+
+
+def _current_day():
+    return datetime.now(_PACIFIC).date().isoformat()
+
+
+def _roll_day():
+    """Resets the counters when the Pacific day changes (caller holds _lock)."""
+    global _day, _global_used
+    today = _current_day()
+    if today != _day:
+        _day = today
+        _global_used = 0
+        _user_used.clear()
+
+
+def charge(user_id, method_id):
+    """
+    Reserves the cost of one request. Raises QuotaExhausted if the global remaining
+    budget can't cover it, or for reads, if the user's budget (when set) can't.
+    """
+    global _global_used
+    cost = method_cost(method_id)
+    if not cost:
+        return 0
+    with _lock:
+        _roll_day()
+        user_used = _user_used.get(user_id, 0)
+        if _global_used + cost > DAILY_BUDGET:
+            raise QuotaExhausted(f"Daily YouTube API quota exhausted ({_global_used}/{DAILY_BUDGET} units)")
+        if (user_id is not None and USER_DAILY_BUDGET and method_id.endswith('.list')
+                and user_used + cost > USER_DAILY_BUDGET):
+            raise QuotaExhausted(f"Daily YouTube API quota for this user exhausted ({user_used}/{USER_DAILY_BUDGET} units)")
+        _global_used += cost
+        if user_id is not None:
+            _user_used[user_id] = user_used + cost
+    return cost
+
+
+def mark_exhausted():
+    """
+    Called when YouTube answers quotaExceeded: nothing more is sent until the quota day resets.
+    """
+    global _global_used
+    with _lock:
+        _roll_day()
+        _global_used = DAILY_BUDGET
+
+
+def remaining(user_id=None):
+    """
+    Units left today for the user (bounded by the global remainder), or globally if user_id is None.
+    """
+    with _lock:
+        _roll_day()
+        global_left = DAILY_BUDGET - _global_used
+        if user_id is None or not USER_DAILY_BUDGET:
+            return global_left
+        return min(global_left, USER_DAILY_BUDGET - _user_used.get(user_id, 0))
+
+
+def is_low(user_id):
+    """
+    True when the global or (if set) the user's remaining budget is below LOW_RATIO.
+    """
+    with _lock:
+        _roll_day()
+        global_left = DAILY_BUDGET - _global_used
+        user_left = USER_DAILY_BUDGET - _user_used.get(user_id, 0)
+    if global_left < DAILY_BUDGET * LOW_RATIO:
+        return True
+    return bool(USER_DAILY_BUDGET) and user_left < USER_DAILY_BUDGET * LOW_RATIO
+
+
+def cap_pages(user_id, max_pages):
+    """
+    Returns max_pages, lowered to LOW_MAX_PAGES while the budget is low.
+    """
+    if not is_low(user_id):
+        return max_pages
+    return min(max_pages, LOW_MAX_PAGES) if max_pages else LOW_MAX_PAGES
+
+
+def get_status(user_id=None):
+    """
+    Usage snapshot for /api/metrics.
+    """
+    with _lock:
+        _roll_day()
+        status = {
+            'day': _day,
+            'global_used': _global_used,
+            'global_budget': DAILY_BUDGET,
+            'global_remaining': DAILY_BUDGET - _global_used,
+            'users_tracked': len(_user_used),
+        }
+        if user_id is not None:
+            status['user_used'] = _user_used.get(user_id, 0)
+            status['user_budget'] = USER_DAILY_BUDGET or None
+            status['user_remaining'] = DAILY_BUDGET - _global_used
+            if USER_DAILY_BUDGET:
+                status['user_remaining'] = min(status['user_remaining'],
+                                               USER_DAILY_BUDGET - _user_used.get(user_id, 0))
+    if user_id is not None:
+        status['low'] = is_low(user_id)
+    return status
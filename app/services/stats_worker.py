@@ -0,0 +1,100 @@
+"""
+Background refresher for the precomputed per-video reply stats (video_reply_stats).
+
+Every STATS_WORKER_INTERVAL_SEC it goes over the latest uploads of every user who
+signed in recently and recounts the videos whose stored stats are older than
+REPLY_STATS_MAX_AGE_SEC, so /videos can render stored stats instead of crawling
+comments. The worker stops for the day once it has spent STATS_WORKER_DAILY_UNITS.
+
+Runs either as a daemon thread inside the web process (STATS_WORKER_IN_APP=true)
+or standalone via run_worker.py. Quota counters are per process: standalone, the
+worker can't see what the web process spends, so keep STATS_WORKER_DAILY_UNITS
+well below the project quota left over by web traffic. In-app, its spend is
+measured on the shared counters and includes concurrent web requests (so the cap
+is reached early rather than late).
+"""
+import os
+import time
+import threading
+
+from app import database
+from app.services import youtube_service
+from app.services import quota
+
+INTERVAL_SEC = int(os.environ.get('STATS_WORKER_INTERVAL_SEC', '900'))
+ACTIVE_DAYS = int(os.environ.get('STATS_WORKER_ACTIVE_DAYS', '7'))
+VIDEOS_PER_USER = int(os.environ.get('STATS_WORKER_VIDEOS', '50'))
+# YouTube quota units the worker may spend per (Pacific) quota day
+DAILY_UNITS = int(os.environ.get('STATS_WORKER_DAILY_UNITS', '2000'))
+
+_thread = None
+_thread_lock = threading.Lock()
+
+_spent_day = None
+_spent_units = 0
+
+
+def _units_left():
+    global _spent_day, _spent_units
+    today = quota.get_status()['day']
+    if today != _spent_day:
+        _spent_day = today
+        _spent_units = 0
+    return DAILY_UNITS - _spent_units
+
+
+def refresh_user(user_id, video_ids=None):
+    """
+    Recounts and stores stats for the given videos (default: the user's latest uploads)
+    whose stored rows are missing or older than REPLY_STATS_MAX_AGE_SEC.
+    Returns {video_id: stats}.
+    """
+    if video_ids is None:
+        video_ids = youtube_service.get_recent_video_ids(user_id, limit=VIDEOS_PER_USER)
+    return youtube_service.get_reply_stats_map(user_id, video_ids)
+
+
+def run_once():
+    """
+    One pass over all active users. Errors of one user don't stop the others.
+    """
+    user_ids = database.get_active_user_ids(days=ACTIVE_DAYS)
+    print(f"[INFO] Stats worker: refreshing {len(user_ids)} active users")
+    global _spent_units
+    for user_id in user_ids:
+        if _units_left() <= 0:
+            print(f"[INFO] Stats worker: daily budget of {DAILY_UNITS} units spent, pausing until the quota day resets")
+            return
+        if quota.is_low(user_id):
+            print(f"[INFO] Stats worker: skipping {user_id} (YouTube quota low)")
+            continue
+        used_before = quota.get_status()['global_used']
+        try:
+            stats_map = refresh_user(user_id)
+            print(f"[INFO] Stats worker: refreshed {len(stats_map)} videos for {user_id}")
+        except Exception as e:
+            print(f"[WARN] Stats worker failed for {user_id}: {e}")
+        finally:
+            _spent_units += max(0, quota.get_status()['global_used'] - used_before)
+
+
+def run_forever(interval=INTERVAL_SEC):
+    while True:
+        started = time.monotonic()
+        try:
+            run_once()
+        except Exception as e:
+            print(f"[WARN] Stats worker pass failed: {e}")
+        time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+
+def start_in_background(interval=INTERVAL_SEC):
+    """
+    Starts run_forever in a daemon thread (once per process).
+    """
+    global _thread
+    with _thread_lock:
+        if _thread is None:
+            _thread = threading.Thread(target=run_forever, args=(interval,), name='stats-worker', daemon=True)
+            _thread.start()
+    return _thread
@@ -1,69 +1,155 @@
-from googleapiclient.discovery import build
-from app.services import auth
+from app.services import google_clients
+from app.services import fanout
+from app.services import comment_store
+from app.services import quota
+from app.services.comment_records import Comment, Reply
 from app import database
 
 from googleapiclient.errors import HttpError
+from cachetools import TTLCache
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_random_exponential
+import os
+import json
+import time
+import base64
+import threading
+
+# Snapshots synced within this window are served without touching the API
+SNAPSHOT_FRESH_SEC = int(os.environ.get('COMMENT_SNAPSHOT_FRESH_SEC', '60'))
+# Full re-crawl interval (picks up new replies on old threads and deleted comments)
+SNAPSHOT_RESYNC_SEC = int(os.environ.get('COMMENT_SNAPSHOT_RESYNC_SEC', str(6 * 3600)))
+
+# Striped locks so concurrent requests for the same video don't crawl it twice
+_sync_locks = [threading.Lock() for _ in range(64)]
+
+# Video metadata (title/thumbnail/description) keyed by (user_id, video_id), LRU + TTL
+VIDEO_CACHE_TTL_SEC = int(os.environ.get('VIDEO_CACHE_TTL_SEC', '1800'))
+_video_cache = TTLCache(maxsize=int(os.environ.get('VIDEO_CACHE_SIZE', '4096')), ttl=VIDEO_CACHE_TTL_SEC)
+_video_cache_lock = threading.Lock()
+
+# Per-video reply stats keyed by (user_id, video_id), so re-sorting /videos doesn't recount
+REPLY_STATS_TTL_SEC = int(os.environ.get('REPLY_STATS_TTL_SEC', '300'))
+_reply_stats_cache = TTLCache(maxsize=int(os.environ.get('REPLY_STATS_CACHE_SIZE', '8192')), ttl=REPLY_STATS_TTL_SEC)
+_reply_stats_lock = threading.Lock()
+
+# Channel metadata (uploads playlist, title, icon, subscribers) per user; also kept in channel_info
+CHANNEL_INFO_TTL_SEC = int(os.environ.get('CHANNEL_INFO_TTL_SEC', str(24 * 3600)))
+CHANNEL_INFO_FIELDS = ('channel_id', 'name', 'icon', 'subscriber_count', 'uploads_playlist_id', 'updated_at')
+_channel_cache = TTLCache(maxsize=int(os.environ.get('CHANNEL_INFO_CACHE_SIZE', '1024')), ttl=CHANNEL_INFO_TTL_SEC)
+_channel_cache_lock = threading.Lock()
+
+EMPTY_REPLY_STATS = {'total': 0, 'replied': 0, 'pending': 0, 'unreplied': 0, 'rate': 0}
+
+# Precomputed rows in video_reply_stats older than this are recounted live
+REPLY_STATS_MAX_AGE_SEC = int(os.environ.get('REPLY_STATS_MAX_AGE_SEC', str(6 * 3600)))
+# commentThreads pages crawled per video when counting only to rank /videos by
+# unreplied comments (100 threads each), so a cold store stays bounded; 0 = no cap.
+# Displayed stats are always full counts
+REPLY_STATS_MAX_PAGES = int(os.environ.get('REPLY_STATS_MAX_PAGES', '5'))
+STORED_STATS_FIELDS = ('total', 'replied', 'pending', 'unreplied', 'rate', 'updated_at')
+# (user_id, video_id) -> time of the last reply/delete/mark in this process; video_id None
+# covers all of the user's videos. Entries are useless once older than REPLY_STATS_MAX_AGE_SEC
+_reply_stats_dirty_at = TTLCache(maxsize=int(os.environ.get('REPLY_STATS_CACHE_SIZE', '8192')),
+                                 ttl=REPLY_STATS_MAX_AGE_SEC)
+
+# Comments page / API page size, and videos whose snapshot is being filled in the background
+COMMENTS_PAGE_SIZE = int(os.environ.get('COMMENTS_PAGE_SIZE', '50'))
+_STATUS_ORDER = {'unreplied': 0, 'pending': 1, 'replied': 2}
+_background_syncs = set()
+_background_syncs_lock = threading.Lock()
+
+# Reply posting: attempts per reply on rate limits/503 (exponential backoff with jitter,
+# capped) and the time budget of one post_replies batch
+POST_REPLY_ATTEMPTS = int(os.environ.get('POST_REPLY_ATTEMPTS', '4'))
+POST_REPLY_BACKOFF_MAX_SEC = float(os.environ.get('POST_REPLY_BACKOFF_MAX_SEC', '8'))
+POST_REPLIES_DEADLINE_SEC = float(os.environ.get('POST_REPLIES_DEADLINE_SEC', '120'))
+# comments().insert isn't idempotent: 500/502/504 may come back after the reply was
+# saved, so only answers that mean "not processed" are retried
+_RETRYABLE_STATUSES = {429, 503}
 
 def get_youtube_client(user_id):
     user = database.get_user(user_id)
-    creds = auth.get_credentials_from_user(user)
-    return build('youtube', 'v3', credentials=creds)
+    return google_clients.get_client(user_id, user, 'youtube', 'v3')
 
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
 def get_video_stats(user_id, video_id):
     """
-    Helper to get stats for a video.
-    Used by get_recent_videos for sorting.
+    Helper to get stats for a single video (served from the reply stats cache when fresh).
     """
-    # Limit max_pages to 5 (500 comments) to avoid excessive API usage/latency during sort
-    data = get_video_comments(user_id, video_id, sort_by='date_desc', max_pages=5)
-    stats = data['stats']
+    stats = get_reply_stats_map(user_id, [video_id]).get(video_id, dict(EMPTY_REPLY_STATS))
     return stats['unreplied'], stats
 
 def get_analytics_client(user_id):
     user = database.get_user(user_id)
-    creds = auth.get_credentials_from_user(user)
-    return build('youtubeAnalytics', 'v2', credentials=creds)
+    return google_clients.get_client(user_id, user, 'youtubeAnalytics', 'v2')
 
-def get_channel_info(user_id):
-    youtube = get_youtube_client(user_id)
-    response = youtube.channels().list(
-        mine=True,
-        part='snippet,statistics'
-    ).execute()
-    
-    if not response['items']:
-        return None
-    
-    channel = response['items'][0]
+def _channel_metadata(channel):
+    """
+    Builds the cached channel metadata from a channels() item
+    (part='id,snippet,statistics,contentDetails').
+    """
     return {
+        'channel_id': channel['id'],
         'name': channel['snippet']['title'],
         'icon': channel['snippet']['thumbnails']['default']['url'],
-        'subscriber_count': int(channel['statistics'].get('subscriberCount', 0))
+        'subscriber_count': int(channel['statistics'].get('subscriberCount', 0)),
+        'uploads_playlist_id': channel['contentDetails']['relatedPlaylists']['uploads'],
+        'updated_at': datetime.utcnow().isoformat()
     }
 
-def get_recent_videos(user_id, limit=200, sort_by='date_desc'):
-    youtube = get_youtube_client(user_id)
-    
-    # Special handling for 'unreplied_desc' to save quota
-    # We only fetch top 50 videos and check their reply status
-    if sort_by == 'unreplied_desc':
-        limit = 50
+def store_channel_metadata(user_id, channel):
+    """
+    Caches channel metadata fetched elsewhere (save_session) in the process and in channel_info.
+    """
+    info = _channel_metadata(channel)
+    with _channel_cache_lock:
+        _channel_cache[user_id] = info
+    database.save_channel_info(user_id, info)
+    return info
+
+def get_channel_metadata(user_id):
+    """
+    Returns {'channel_id', 'name', 'icon', 'subscriber_count', 'uploads_playlist_id'}.
+    Served from the process cache, then the channel_info table, and only fetched
+    from YouTube when both are older than CHANNEL_INFO_TTL_SEC.
+    """
+    with _channel_cache_lock:
+        info = _channel_cache.get(user_id)
+    if info:
+        return info
+
+    row = database.get_channel_info(user_id)
+    if row and _parse_timestamp(row.get('updated_at')) >= time.time() - CHANNEL_INFO_TTL_SEC:
+        info = {field: row[field] for field in CHANNEL_INFO_FIELDS}
+        with _channel_cache_lock:
+            _channel_cache[user_id] = info
+        return info
 
-    # 1. Get Uploads playlist ID
-    channels_response = youtube.channels().list(
+    youtube = get_youtube_client(user_id)
+    response = youtube.channels().list(
         mine=True,
-        part='contentDetails'
+        part='id,snippet,statistics,contentDetails'
     ).execute()
-    uploads_playlist_id = channels_response['items'][0]['contentDetails']['relatedPlaylists']['uploads']
+    
+    if not response['items']:
+        return None
+    return store_channel_metadata(user_id, response['items'][0])
 
-    # 2. Get recent videos from playlist (Loop for limit)
-    playlist_items = []
+def get_channel_info(user_id):
+    return get_channel_metadata(user_id)
+
+def _iter_upload_pages(youtube, uploads_playlist_id, limit):
+    """
+    Yields pages (lists of playlistItems) of the channel's uploads playlist, newest
+    first, until 'limit' items have been returned.
+    """
+    # Get recent videos from playlist (Loop for limit)
+    fetched = 0
     next_page_token = None
     
-    while len(playlist_items) < limit:
-        request_limit = min(50, limit - len(playlist_items))
+    while fetched < limit:
+        request_limit = min(50, limit - fetched)
         response = youtube.playlistItems().list(
             playlistId=uploads_playlist_id,
             part='snippet,contentDetails',
@@ -71,67 +157,105 @@ def get_recent_videos(user_id, limit=200, sort_by='date_desc'):
             pageToken=next_page_token
         ).execute()
         
-        playlist_items.extend(response['items'])
+        fetched += len(response['items'])
+        yield response['items']
         next_page_token = response.get('nextPageToken')
         
-        if not next_page_token:
+        if not next_page_token or not response['items']:
             break
 
+def _get_upload_items(youtube, uploads_playlist_id, limit):
+    """
+    Returns up to 'limit' playlistItems of the channel's uploads playlist (newest first).
+    """
+    return [item for page in _iter_upload_pages(youtube, uploads_playlist_id, limit) for item in page]
+
+def _fetch_video_statistics(user_id, video_ids):
+    """
+    Returns {video_id: (statistics, duration)} for up to 50 videos.
+    Runs on the fan-out pool, so it uses that thread's own client.
+    """
+    response = get_youtube_client(user_id).videos().list(
+        part='statistics,contentDetails',
+        id=','.join(video_ids)
+    ).execute()
+    return {item['id']: (item['statistics'], item['contentDetails']['duration']) for item in response['items']}
+
+def _fetch_watch_time(user_id, video_ids):
+    """
+    Returns {video_id: analytics row} for up to 50 videos (50 keeps the filter under URL length limits).
+    """
+    analytics = get_analytics_client(user_id)
+    analytics_response = analytics.reports().query(
+        ids='channel==MINE',
+        startDate='2010-01-01',
+        endDate=datetime.now().strftime('%Y-%m-%d'),
+        metrics='estimatedMinutesWatched,averageViewDuration',
+        dimensions='video',
+        filters=f'video=={",".join(video_ids)}'
+    ).execute()
+
+    analytics_map = {}
+    for row in analytics_response.get('rows', []):
+        analytics_map[row[0]] = {
+            'estimatedMinutesWatched': row[1],
+            'averageViewDuration': row[2]
+        }
+    return analytics_map
+
+def get_recent_video_ids(user_id, limit=50):
+    """
+    Returns the ids of the latest uploads without statistics or analytics
+    (used by the background stats worker; costs 1 unit per 50 videos plus 1).
+    """
+    youtube = get_youtube_client(user_id)
+    items = _get_upload_items(youtube, get_channel_metadata(user_id)['uploads_playlist_id'], limit)
+    for item in items:
+        _cache_video_details(user_id, item['contentDetails']['videoId'], item['snippet'])
+    return [item['contentDetails']['videoId'] for item in items]
+
+def get_recent_videos(user_id, limit=200, sort_by='date_desc'):
+    youtube = get_youtube_client(user_id)
+    
+    # Special handling for 'unreplied_desc' to save quota
+    # We only fetch top 50 videos and check their reply status
+    if sort_by == 'unreplied_desc':
+        limit = 50
+
+    # Playlist pages are sequential, but each page's statistics and analytics
+    # chunks start on the fan-out pool as soon as the page arrives, so they
+    # overlap with the next playlist pages and with each other.
+    playlist_items = []
+    batch = fanout.Batch(user_id)
+    # Watch time is optional, so analytics is skipped while the quota budget is low
+    with_analytics = not quota.is_low(user_id)
+    uploads_playlist_id = get_channel_metadata(user_id)['uploads_playlist_id']
+    for page in _iter_upload_pages(youtube, uploads_playlist_id, limit):
+        playlist_items.extend(page)
+        chunk_ids = tuple(item['contentDetails']['videoId'] for item in page)
+        if chunk_ids:
+            batch.submit(('statistics', chunk_ids), _fetch_video_statistics, user_id, chunk_ids)
+            if with_analytics:
+                batch.submit(('analytics', chunk_ids), _fetch_watch_time, user_id, chunk_ids)
+
     if not playlist_items:
         return []
 
-    video_ids = [item['contentDetails']['videoId'] for item in playlist_items]
-    
-    # 3. Get Video Statistics (View Count) - Batching
     stats_map = {}
     duration_map = {}
-    
-    # Process in chunks of 50
-    for i in range(0, len(video_ids), 50):
-        chunk_ids = video_ids[i:i+50]
-        stats_response = youtube.videos().list(
-            part='statistics,contentDetails',
-            id=','.join(chunk_ids)
-        ).execute()
-        
-        for item in stats_response['items']:
-            stats_map[item['id']] = item['statistics']
-            duration_map[item['id']] = item['contentDetails']['duration']
-
-    # 4. Get Analytics Data (Watch Time) - Batching
     analytics_map = {}
-    try:
-        analytics = get_analytics_client(user_id)
-        end_date = datetime.now().strftime('%Y-%m-%d')
-        start_date = '2010-01-01'
-        
-        # Process in chunks of 50 to avoid URL length limits
-        for i in range(0, len(video_ids), 50):
-            chunk_ids = video_ids[i:i+50]
-            
-            try:
-                analytics_response = analytics.reports().query(
-                    ids='channel==MINE',
-                    startDate=start_date,
-                    endDate=end_date,
-                    metrics='estimatedMinutesWatched,averageViewDuration',
-                    dimensions='video',
-                    filters=f'video=={",".join(chunk_ids)}'
-                ).execute()
-                
-                if 'rows' in analytics_response:
-                    for row in analytics_response['rows']:
-                        vid = row[0]
-                        analytics_map[vid] = {
-                            'estimatedMinutesWatched': row[1],
-                            'averageViewDuration': row[2]
-                        }
-            except Exception as e:
-                print(f"[WARN] Analytics batch failed: {e}")
-                
-    except Exception as e:
-        print(f"[DEBUG] Error fetching analytics: {type(e).__name__}: {e}")
-        pass
+    for (kind, chunk_ids), result, error in batch.iter_completed():
+        if error is not None:
+            if kind == 'statistics':
+                print(f"[WARN] Video statistics batch failed: {error}")
+            else:
+                print(f"[WARN] Analytics batch failed: {error}")
+        elif kind == 'statistics':
+            for vid, (statistics, duration) in result.items():
+                stats_map[vid] = statistics
+                duration_map[vid] = duration
+        else:
+            analytics_map.update(result)
 
     videos = []
     for item in playlist_items:
@@ -140,6 +264,8 @@ def get_recent_videos(user_id, limit=200, sort_by='date_desc'):
         stats = stats_map.get(vid, {})
         analytics = analytics_map.get(vid, {'estimatedMinutesWatched': 0, 'averageViewDuration': 0})
         
+        _cache_video_details(user_id, vid, snippet)
+
         video_data = {
             'id': vid,
             'title': snippet['title'],
@@ -162,181 +288,584 @@ def get_recent_videos(user_id, limit=200, sort_by='date_desc'):
     elif sort_by == 'watch_time_desc':
         videos.sort(key=lambda x: x['watch_time_mins'], reverse=True)
     elif sort_by == 'unreplied_desc':
-        # Fetch comment stats for each video to calculate unreplied count
-        print("[INFO] Sorting by unreplied_desc: Fetching comments for top 50 videos...")
+        # Fetch comment stats for the top 50 videos in parallel (cached counts are reused).
+        # The stats are attached to each video so the caller doesn't fetch them again.
+        print("[INFO] Sorting by unreplied_desc: Fetching comment stats for top 50 videos...")
+        stats_map = get_reply_stats_map(user_id, [video['id'] for video in videos],
+                                        max_pages=REPLY_STATS_MAX_PAGES or None)
         for video in videos:
-            unreplied_count, _ = get_video_stats(user_id, video['id'])
-            video['unreplied_count'] = unreplied_count
+            stats = stats_map.get(video['id'])
+            if stats:
+                video['unreplied_count'] = stats['unreplied']
+                # Capped counts only rank; the caller counts displayed videos in full
+                if not stats.get('truncated'):
+                    video['reply_stats'] = stats
         
         # Sort by unreplied count descending
         videos.sort(key=lambda x: x['unreplied_count'], reverse=True)
 
     return videos
 
+def _process_thread(item, video_id, my_channel_id):
+    """
+    Converts a raw commentThreads item into a Comment record.
+    Returns None for threads started by the channel owner.
+    """
+    top_level_comment = item['snippet']['topLevelComment']
+    top_level_snippet = top_level_comment['snippet']
+    reply_count = item['snippet']['totalReplyCount']
+    
+    # Filter A: Top level comment
+    # Filter B: Not from me
+    if top_level_snippet['authorChannelId']['value'] == my_channel_id:
+        return None
+    
+    # Process replies (checking whether I replied on the way)
+    replied_by_me = False
+    processed_replies = []
+    for reply in item.get('replies', {}).get('comments', []):
+        rs = reply['snippet']
+        is_mine_reply = rs['authorChannelId']['value'] == my_channel_id
+        replied_by_me = replied_by_me or is_mine_reply
+        processed_replies.append(Reply(
+            id=reply['id'],
+            text=rs.get('textOriginal', rs['textDisplay']),
+            author_name=rs['authorDisplayName'],
+            author_image=rs['authorProfileImageUrl'],
+            published_at=rs['publishedAt'],
+            updated_at=rs['updatedAt'],
+            like_count=rs.get('likeCount', 0),
+            video_id=video_id,
+            is_mine=is_mine_reply
+        ))
+    # Sort replies by date (oldest first for conversation flow)
+    processed_replies.sort(key=lambda x: x.published_at)
+
+    # Manual completion is applied when reading, since it changes independently of YouTube
+    return Comment(
+        id=top_level_comment['id'], # Use TopLevelComment ID, not Thread ID
+        text=top_level_snippet.get('textOriginal', top_level_snippet['textDisplay']), # Prefer textOriginal
+        author_name=top_level_snippet['authorDisplayName'],
+        author_image=top_level_snippet['authorProfileImageUrl'],
+        published_at=top_level_snippet['publishedAt'],
+        updated_at=top_level_snippet['updatedAt'],
+        like_count=top_level_snippet.get('likeCount', 0),
+        viewer_rating=top_level_snippet.get('viewerRating', 'none'),
+        reply_count=reply_count,
+        video_id=video_id,
+        is_replied=replied_by_me,
+        replies=processed_replies
+    )
+
+def _sync_lock(user_id, video_id):
+    return _sync_locks[hash((user_id, video_id)) % len(_sync_locks)]
+
+def _comment_threads_request(youtube, video_id, page_token=None):
+    return youtube.commentThreads().list(
+        part='snippet,replies',
+        videoId=video_id,
+        maxResults=100,
+        order='time',
+        pageToken=page_token,
+        textFormat='plainText'
+    )
+
+def _is_comments_disabled(e):
+    return isinstance(e, HttpError) and e.resp.status == 403 and 'commentsDisabled' in str(e)
+
+def _iter_thread_pages(youtube, video_id, max_pages=None, first_page=None):
+    """
+    Yields (items, has_more) for each commentThreads page (newest first) as it arrives.
+    first_page is an already fetched first response (see _prefetch_first_pages).
+    """
+    next_page_token = None
+    page_count = 0
+    while not (max_pages and page_count >= max_pages):
+        if page_count == 0 and first_page is not None:
+            response = first_page
+        else:
+            response = _comment_threads_request(youtube, video_id, next_page_token).execute()
+        page_count += 1
+
+        next_page_token = response.get('nextPageToken')
+        yield response['items'], bool(next_page_token)
+        if not next_page_token:
+            return
+
+def sync_comment_snapshot(user_id, video_id, my_channel_id, max_pages=None, first_page=None):
+    """
+    Brings the stored snapshot of a video up to date.
+    - No snapshot (or an incomplete/stale one): full crawl, written page by page
+      so memory stays flat however many comments the video has.
+    - Otherwise: fetch newest-first pages only until a known thread with an
+      unchanged updatedAt and totalReplyCount is reached.
+    Threads are listed by publish time, so replies on old threads are only picked
+    up by the periodic full resync (COMMENT_SNAPSHOT_RESYNC_SEC).
+    While the quota budget is low, stored snapshots are not refreshed and new
+    crawls stop after quota.LOW_MAX_PAGES pages.
+    """
+    with _sync_lock(user_id, video_id):
+        meta = comment_store.get_snapshot_meta(user_id, video_id)
+        now = time.time()
+        if meta and meta['is_complete'] and now - meta['synced_at'] < SNAPSHOT_FRESH_SEC:
+            return
+        if meta and quota.is_low(user_id):
+            # Quota is running low: serve the stored snapshot as it is
+            return
+        max_pages = quota.cap_pages(user_id, max_pages)
+
+        incremental = bool(meta and meta['is_complete'] and now - meta['full_synced_at'] < SNAPSHOT_RESYNC_SEC)
+        youtube = get_youtube_client(user_id)
+        pages = _iter_thread_pages(youtube, video_id, max_pages=max_pages, first_page=first_page)
+
+        if incremental:
+            # New threads are few, so they are saved together once the gap is closed
+            known = comment_store.get_known_threads(user_id, video_id)
+            fetched = []
+            is_complete = False
+            for items, has_more in pages:
+                reached_known = False
+                for item in items:
+                    thread_id = item['snippet']['topLevelComment']['id']
+                    if known.get(thread_id) == (
+                            item['snippet']['topLevelComment']['snippet']['updatedAt'],
+                            item['snippet']['totalReplyCount']):
+                        reached_known = True
+                        break
+
+                    record = _process_thread(item, video_id, my_channel_id)
+                    if record:
+                        fetched.append(record)
+
+                if reached_known or not has_more:
+                    is_complete = True
+                    break
+            comment_store.save_threads(user_id, video_id, fetched, is_complete=is_complete)
+            return
+
+        # Full crawl: each page is stored as it arrives and only thread ids are kept
+        seen_thread_ids = set()
+        is_complete = False
+        for items, has_more in pages:
+            records = [record for record in (_process_thread(item, video_id, my_channel_id) for item in items) if record]
+            comment_store.put_threads(user_id, video_id, records)
+            seen_thread_ids.update(record.id for record in records)
+            if not has_more:
+                is_complete = True
+        comment_store.finish_full_sync(user_id, video_id, seen_thread_ids, is_complete)
+
+def _count_statuses(user_id, video_id, completed_thread_ids):
+    """
+    Counts stored threads per status from their keys (no comment records are decoded).
+    """
+    counts = dict.fromkeys(_STATUS_ORDER, 0)
+    for thread_id, is_replied, _, _ in comment_store.iter_thread_keys(user_id, video_id):
+        counts[_comment_status(is_replied, thread_id in completed_thread_ids)] += 1
+    return counts
+
+def _stats_from_counts(counts):
+    total = sum(counts.values())
+    return {
+        'total': total,
+        'replied': counts['replied'],
+        'pending': counts['pending'],
+        'unreplied': counts['unreplied'],
+        'rate': int((counts['replied'] / total) * 100) if total > 0 else 0
+    }
+
+def get_video_reply_counts(user_id, video_id, max_pages=None, first_page=None):
+    """
+    Returns the stats dict of get_video_comments without building comment records
+    (for callers that only need counts).
+    """
+    user = database.get_user(user_id)
+    completed_thread_ids = database.get_completed_threads(user_id, video_id=video_id, jwt=user.get('jwt'))
+    try:
+        sync_comment_snapshot(user_id, video_id, user['channel_id'], max_pages=max_pages, first_page=first_page)
+    except HttpError as e:
+        if _is_comments_disabled(e):
+            return dict(EMPTY_REPLY_STATS)
+        raise e
+    return _stats_from_counts(_count_statuses(user_id, video_id, completed_thread_ids))
+
 def get_video_comments(user_id, video_id, sort_by='date_desc', max_pages=None):
-    youtube = get_youtube_client(user_id)
     user = database.get_user(user_id)
     my_channel_id = user['channel_id']
     jwt = user.get('jwt')
 
     # Fetch completed threads
-    completed_thread_ids = set(database.get_completed_threads(user_id, jwt=jwt))
+    completed_thread_ids = database.get_completed_threads(user_id, video_id=video_id, jwt=jwt)
 
-    unreplied_comments = []
-    replied_comments = []
-    pending_comments = []
-    
-    next_page_token = None
-    page_count = 0
-    
-    while True:
-        if max_pages and page_count >= max_pages:
-            break
-            
-        try:
-            response = youtube.commentThreads().list(
-                part='snippet,replies',
-                videoId=video_id,
-                maxResults=100,
-                pageToken=next_page_token,
-                textFormat='plainText'
-            ).execute()
-        except HttpError as e:
-            if e.resp.status == 403 and 'commentsDisabled' in str(e):
-                return {'comments': [], 'stats': {'total': 0, 'replied': 0, 'pending': 0, 'unreplied': 0, 'rate': 0}}
-            raise e
+    try:
+        sync_comment_snapshot(user_id, video_id, my_channel_id, max_pages=max_pages)
+    except HttpError as e:
+        if _is_comments_disabled(e):
+            return {'comments': [], 'stats': dict(EMPTY_REPLY_STATS)}
+        raise e
 
-        page_count += 1
+    # Classify records as they are decoded, then sort once:
+    # Unreplied -> Pending -> Replied, each ordered by sort_by
+    counts = dict.fromkeys(_STATUS_ORDER, 0)
+    combined_comments = []
+    for comment_data in comment_store.iter_threads(user_id, video_id):
+        # Check if manually completed
+        is_manually_completed = comment_data.id in completed_thread_ids
+        comment_data.is_manually_completed = is_manually_completed
+        counts[_comment_status(comment_data.is_replied, is_manually_completed)] += 1
+        combined_comments.append(comment_data)
 
+    # Records come newest first, so stable sorts keep that order for ties
+    if sort_by == 'date_asc':
+        combined_comments.sort(key=lambda x: x.published_at)
+    elif sort_by == 'likes_desc':
+        combined_comments.sort(key=lambda x: x.like_count, reverse=True)
+    combined_comments.sort(key=lambda x: _STATUS_ORDER[_comment_status(x.is_replied, x.is_manually_completed)])
 
-        for item in response['items']:
-            top_level_comment = item['snippet']['topLevelComment']
-            top_level_snippet = top_level_comment['snippet']
-            reply_count = item['snippet']['totalReplyCount']
-            
-            # Filter A: Top level comment
-            # Filter B: Not from me
-            if top_level_snippet['authorChannelId']['value'] == my_channel_id:
-                continue
-            
-            # Check if replied by me
-            replied_by_me = False
-            if 'replies' in item:
-                for reply in item['replies']['comments']:
-                    if reply['snippet']['authorChannelId']['value'] == my_channel_id:
-                        replied_by_me = True
-                        break
-            
-            # Check if manually completed
-            is_manually_completed = top_level_comment['id'] in completed_thread_ids
-            
-            # Process replies
-            raw_replies = item.get('replies', {}).get('comments', [])
-            processed_replies = []
-            for reply in raw_replies:
-                rs = reply['snippet']
-                is_mine_reply = rs['authorChannelId']['value'] == my_channel_id
-                processed_replies.append({
-                    'id': reply['id'],
-                    'text': rs.get('textOriginal', rs['textDisplay']),
-                    'author_name': rs['authorDisplayName'],
-                    'author_image': rs['authorProfileImageUrl'],
-                    'published_at': rs['publishedAt'],
-                    'updated_at': rs['updatedAt'],
-                    'like_count': rs.get('likeCount', 0),
-                    'video_id': video_id,
-                    'is_mine': is_mine_reply
-                })
-            # Sort replies by date (oldest first for conversation flow)
-            processed_replies.sort(key=lambda x: x['published_at'])
-
-            comment_data = {
-                'id': top_level_comment['id'], # Use TopLevelComment ID, not Thread ID
-                'text': top_level_snippet.get('textOriginal', top_level_snippet['textDisplay']), # Prefer textOriginal
-                'author_name': top_level_snippet['authorDisplayName'],
-                'author_image': top_level_snippet['authorProfileImageUrl'],
-                'published_at': top_level_snippet['publishedAt'],
-                'updated_at': top_level_snippet['updatedAt'],
-                'like_count': top_level_snippet.get('likeCount', 0),
-                'viewer_rating': top_level_snippet.get('viewerRating', 'none'), # Fetch viewer rating
-                'reply_count': reply_count,
-                'video_id': video_id,
-                'is_replied': replied_by_me,
-                'is_manually_completed': is_manually_completed,
-                'replies': processed_replies, # Use processed replies
-                'viewer_rating': top_level_snippet.get('viewerRating', 'none'),
-                'is_edited': top_level_snippet['updatedAt'] != top_level_snippet['publishedAt']
-            }
-            
-            if replied_by_me:
-                replied_comments.append(comment_data)
-            elif is_manually_completed:
-                pending_comments.append(comment_data)
-            else:
-                unreplied_comments.append(comment_data)
-        
-        next_page_token = response.get('nextPageToken')
-        if not next_page_token:
-            break
-            
-    # Sort each list
-    def sort_comments(comments, sort_key):
-        if sort_key == 'date_desc':
-            return sorted(comments, key=lambda x: x['published_at'], reverse=True)
-        elif sort_key == 'date_asc':
-            return sorted(comments, key=lambda x: x['published_at'])
-        elif sort_key == 'likes_desc':
-            return sorted(comments, key=lambda x: x['like_count'], reverse=True)
-        else:
-            # Default to date_desc
-            return sorted(comments, key=lambda x: x['published_at'], reverse=True)
-
-    unreplied_comments = sort_comments(unreplied_comments, sort_by)
-    pending_comments = sort_comments(pending_comments, sort_by)
-    replied_comments = sort_comments(replied_comments, sort_by)
-
-    # Combine: Unreplied -> Pending -> Replied
-    combined_comments = unreplied_comments + pending_comments + replied_comments
-
-    # Calculate stats
-    unreplied_count = len(unreplied_comments)
-    pending_count = len(pending_comments)
-    replied_count = len(replied_comments)
-    total_comments = unreplied_count + pending_count + replied_count
-    reply_rate = 0
-    if total_comments > 0:
-        reply_rate = int((replied_count / total_comments) * 100)
-        
-    if total_comments > 0:
-        reply_rate = int((replied_count / total_comments) * 100)
-        
     return {
         'comments': combined_comments,
-        'stats': {
-            'total': total_comments,
-            'replied': replied_count,
-            'pending': pending_count,
-            'unreplied': unreplied_count,
-            'rate': reply_rate
-        }
+        'stats': _stats_from_counts(counts)
     }
 
-def get_video_details(user_id, video_id):
-    youtube = get_youtube_client(user_id)
-    response = youtube.videos().list(
-        part='snippet',
-        id=video_id
-    ).execute()
-    
-    if not response['items']:
+def _comment_status(is_replied, is_manually_completed):
+    if is_replied:
+        return 'replied'
+    if is_manually_completed:
+        return 'pending'
+    return 'unreplied'
+
+def _start_background_sync(user_id, video_id, my_channel_id):
+    """
+    Fills (or fully resyncs) the stored snapshot of a video on the fan-out pool.
+    """
+    key = (user_id, video_id)
+    with _background_syncs_lock:
+        if key in _background_syncs:
+            return
+        _background_syncs.add(key)
+
+    def run():
+        try:
+            sync_comment_snapshot(user_id, video_id, my_channel_id)
+        except Exception as e:
+            print(f"[WARN] Background comment sync failed for {video_id}: {e}")
+        finally:
+            with _background_syncs_lock:
+                _background_syncs.discard(key)
+
+    fanout.submit(run)
+
+def _encode_cursor(key):
+    return 'k:' + base64.urlsafe_b64encode(json.dumps(key, separators=(',', ':')).encode()).decode()
+
+def _decode_cursor(cursor):
+    """
+    Returns the sort key stored in a 'k:' cursor, or None if it can't be read.
+    """
+    try:
+        return tuple(json.loads(base64.urlsafe_b64decode(cursor[2:].encode())))
+    except (ValueError, TypeError):
         return None
-        
-    snippet = response['items'][0]['snippet']
+
+def _store_page(user_id, video_id, completed_thread_ids, filter_by, sort_by, after, limit):
+    """
+    Filters and sorts the stored threads of a video by their keys only, then decodes
+    just the requested page. Filters other than unreplied/pending/replied return all
+    threads grouped Unreplied -> Pending -> Replied, like get_video_comments.
+
+    Pages are keyset-based: after is the sort key of the last thread served, so
+    threads that leave the filter in between (replied to, marked) don't shift the
+    next page the way an offset would.
+    """
+    grouped = filter_by not in _STATUS_ORDER
+    # Keys sort ascending in display order when descending=False, and descending
+    # (reverse=True) otherwise; thread_id breaks ties so every key is unique
+    descending = sort_by != 'date_asc'
+    sign = -1 if descending else 1
+
+    key_types = (int, int, str, str) if sort_by == 'likes_desc' else (int, str, str)
+    if after is not None and not (len(after) == len(key_types)
+                                  and all(type(v) is t for v, t in zip(after, key_types))):
+        # Unreadable or from another sort order: start over
+        after = None
+
+    counts = dict.fromkeys(_STATUS_ORDER, 0)
+    selected = []
+    for thread_id, is_replied, published_at, like_count in comment_store.iter_thread_keys(user_id, video_id):
+        status = _comment_status(is_replied, thread_id in completed_thread_ids)
+        counts[status] += 1
+        if not grouped and filter_by != status:
+            continue
+        rank = sign * _STATUS_ORDER[status] if grouped else 0
+        if sort_by == 'likes_desc':
+            key = (rank, like_count or 0, published_at, thread_id)
+        else:
+            key = (rank, published_at, thread_id)
+        if after is not None and ((key >= after) if descending else (key <= after)):
+            continue
+        selected.append(key)
+
+    selected.sort(reverse=descending)
+    page_keys = selected[:limit]
+    comments = comment_store.load_threads_by_id(user_id, video_id, [key[-1] for key in page_keys])
+    for comment_data in comments:
+        comment_data.is_manually_completed = comment_data.id in completed_thread_ids
+
+    stats = _stats_from_counts(counts)
+    next_cursor = _encode_cursor(page_keys[-1]) if len(selected) > limit else None
+    return {'comments': comments, 'next_cursor': next_cursor, 'stats': stats}
+
+def _passthrough_page(user_id, video_id, my_channel_id, completed_thread_ids, filter_by, page_token):
+    """
+    Fetches one commentThreads page straight from YouTube (newest first) and filters it.
+    """
+    youtube = get_youtube_client(user_id)
+    response = _comment_threads_request(youtube, video_id, page_token).execute()
+
+    comments = []
+    for item in response['items']:
+        comment_data = _process_thread(item, video_id, my_channel_id)
+        if not comment_data:
+            continue
+        comment_data.is_manually_completed = comment_data.id in completed_thread_ids
+        status = _comment_status(comment_data.is_replied, comment_data.is_manually_completed)
+        if filter_by not in _STATUS_ORDER or filter_by == status:
+            comments.append(comment_data)
+
+    next_page_token = response.get('nextPageToken')
     return {
+        'comments': comments,
+        'next_cursor': f"t:{next_page_token}" if next_page_token else None,
+        'stats': None
+    }
+
+def get_comments_page(user_id, video_id, filter_by='unreplied', sort_by='date_desc', cursor=None, limit=COMMENTS_PAGE_SIZE):
+    """
+    Returns one page of a video's comments: {'comments', 'next_cursor', 'stats'}.
+    Cursors are 'k:<sort key>' (pages of the local comment store) or 't:<pageToken>'
+    (YouTube pages passed through while the store is filled in the background, used
+    for date_desc when a video has no complete snapshot yet). stats is None for
+    passthrough pages since the counts are not known until the crawl finishes.
+    """
+    user = database.get_user(user_id)
+    my_channel_id = user['channel_id']
+    completed_thread_ids = database.get_completed_threads(user_id, video_id=video_id, jwt=user.get('jwt'))
+
+    try:
+        if cursor and cursor.startswith('t:'):
+            return _passthrough_page(user_id, video_id, my_channel_id, completed_thread_ids, filter_by, cursor[2:])
+
+        after = None
+        if cursor and cursor.startswith('k:'):
+            after = _decode_cursor(cursor)
+        else:
+            # First page: make sure the store can answer without a full crawl in the request
+            meta = comment_store.get_snapshot_meta(user_id, video_id)
+            if meta and meta['is_complete']:
+                if time.time() - meta['full_synced_at'] < SNAPSHOT_RESYNC_SEC:
+                    sync_comment_snapshot(user_id, video_id, my_channel_id)
+                else:
+                    _start_background_sync(user_id, video_id, my_channel_id)
+            elif sort_by == 'date_desc':
+                _start_background_sync(user_id, video_id, my_channel_id)
+                return _passthrough_page(user_id, video_id, my_channel_id, completed_thread_ids, filter_by, None)
+            else:
+                # Other orders need every thread
+                sync_comment_snapshot(user_id, video_id, my_channel_id)
+
+        return _store_page(user_id, video_id, completed_thread_ids, filter_by, sort_by, after, limit)
+    except HttpError as e:
+        if _is_comments_disabled(e):
+            return {'comments': [], 'next_cursor': None, 'stats': dict(EMPTY_REPLY_STATS)}
+        raise e
+
+def _cache_video_details(user_id, video_id, snippet):
+    """
+    Stores video metadata from a videos/playlistItems snippet and returns it.
+    """
+    details = {
         'id': video_id,
         'title': snippet['title'],
-        'thumbnail': snippet['thumbnails'].get('medium', snippet['thumbnails'].get('default'))['url']
+        'thumbnail': snippet['thumbnails'].get('medium', snippet['thumbnails'].get('default'))['url'],
+        'description': snippet.get('description', '')
     }
+    with _video_cache_lock:
+        _video_cache[(user_id, video_id)] = details
+    return details
+
+def get_video_details(user_id, video_id):
+    return get_video_details_map(user_id, [video_id]).get(video_id)
+
+def get_video_details_map(user_id, video_ids):
+    """
+    Returns {video_id: details} for many videos. Cached entries are reused; the rest
+    are looked up 50 ids per videos().list call, sent together as one batch exchange.
+    Videos that don't exist (or failed) are left out.
+    """
+    details = {}
+    missing = []
+    with _video_cache_lock:
+        for video_id in dict.fromkeys(video_ids):
+            cached = _video_cache.get((user_id, video_id))
+            if cached:
+                details[video_id] = cached
+            else:
+                missing.append(video_id)
+    if not missing:
+        return details
+
+    youtube = get_youtube_client(user_id)
+    requests = {
+        tuple(missing[i:i + 50]): youtube.videos().list(part='snippet', id=','.join(missing[i:i + 50]))
+        for i in range(0, len(missing), 50)
+    }
+    responses, errors = google_clients.execute_batch(youtube, requests)
+    for chunk_ids, e in errors.items():
+        print(f"[WARN] Video details lookup failed for {len(chunk_ids)} videos: {e}")
+    for response in responses.values():
+        for item in response['items']:
+            details[item['id']] = _cache_video_details(user_id, item['id'], item['snippet'])
+    return details
+
+def _parse_timestamp(value):
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return 0
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+def _load_stored_stats(user_id, video_ids):
+    """
+    Reads precomputed rows from video_reply_stats, skipping rows that are older than
+    REPLY_STATS_MAX_AGE_SEC or than the last reply/mark on that video in this process
+    (unless the quota budget is low).
+    """
+    rows = database.get_video_reply_stats(user_id, video_ids)
+    low = quota.is_low(user_id)
+    with _reply_stats_lock:
+        user_dirty_at = _reply_stats_dirty_at.get((user_id, None), 0)
+        dirty_at = {video_id: _reply_stats_dirty_at.get((user_id, video_id), 0) for video_id in rows}
+    stored = {}
+    for video_id, row in rows.items():
+        if low:
+            # Quota is running low: any stored count beats a recount
+            not_before = 0
+        else:
+            not_before = max(time.time() - REPLY_STATS_MAX_AGE_SEC, user_dirty_at, dirty_at[video_id])
+        if _parse_timestamp(row.get('updated_at')) >= not_before:
+            stored[video_id] = {field: row[field] for field in STORED_STATS_FIELDS}
+    return stored
+
+def _prefetch_first_pages(user_id, video_ids):
+    """
+    Fetches the first commentThreads page of every video whose snapshot needs a
+    sync, in batched HTTP exchanges; for most videos that page is the whole
+    incremental refresh. Returns (first_pages, disabled_stats): pages keyed by
+    video id, and empty stats for videos that have comments disabled.
+    Other per-video errors are left to the per-video sync to retry.
+    """
+    if quota.is_low(user_id):
+        # Syncs are skipped or capped anyway; don't spend units on pages that may go unused
+        return {}, {}
+
+    now = time.time()
+    stale = []
+    for video_id in video_ids:
+        meta = comment_store.get_snapshot_meta(user_id, video_id)
+        if not (meta and meta['is_complete'] and now - meta['synced_at'] < SNAPSHOT_FRESH_SEC):
+            stale.append(video_id)
+    if len(stale) < 2:
+        return {}, {}
+
+    youtube = get_youtube_client(user_id)
+    requests = {video_id: _comment_threads_request(youtube, video_id) for video_id in stale}
+    first_pages, errors = google_clients.execute_batch(youtube, requests)
+
+    disabled_stats = {}
+    for video_id, e in errors.items():
+        if _is_comments_disabled(e):
+            disabled_stats[video_id] = dict(EMPTY_REPLY_STATS)
+        else:
+            print(f"[WARN] Batched first page failed for video {video_id}: {e}")
+    return first_pages, disabled_stats
+
+def get_reply_stats_map(user_id, video_ids, deadline=fanout.DEFAULT_DEADLINE_SEC, refresh=False, max_pages=None):
+    """
+    Returns {video_id: stats} for many videos. Stats come from the in-process cache,
+    then the video_reply_stats table, and only the rest are counted live in parallel
+    (bounded per user) and written back to both. refresh=True skips both caches
+    (on-demand refresh).
+    With max_pages (ranking only), live counts stop after that many pages; counts of
+    videos that had more are returned with 'truncated': True and are neither cached
+    nor stored, so they are never shown as totals.
+    Videos that fail or miss the deadline are left out of the returned map.
+    """
+    results = {}
+    missing = []
+    if refresh:
+        missing = list(video_ids)
+    else:
+        with _reply_stats_lock:
+            for video_id in video_ids:
+                stats = _reply_stats_cache.get((user_id, video_id))
+                if stats is not None:
+                    results[video_id] = stats
+                else:
+                    missing.append(video_id)
+
+        if missing:
+            stored = _load_stored_stats(user_id, missing)
+            with _reply_stats_lock:
+                for video_id, stats in stored.items():
+                    _reply_stats_cache[(user_id, video_id)] = stats
+            results.update(stored)
+            missing = [video_id for video_id in missing if video_id not in stored]
+
+    if missing:
+        # One batched exchange for the first pages, then per-video syncs only page further when needed
+        first_pages, fetched = _prefetch_first_pages(user_id, missing)
+        counted, errors = fanout.fan_out(
+            user_id,
+            lambda video_id: get_video_reply_counts(user_id, video_id, max_pages=max_pages,
+                                                    first_page=first_pages.get(video_id)),
+            [video_id for video_id in missing if video_id not in fetched],
+            deadline=deadline
+        )
+        for video_id, e in errors.items():
+            print(f"Error fetching stats for video {video_id}: {e}")
+
+        if max_pages:
+            for video_id, stats in list(counted.items()):
+                meta = comment_store.get_snapshot_meta(user_id, video_id)
+                if not (meta and meta['is_complete']):
+                    results[video_id] = dict(stats, truncated=True)
+                    del counted[video_id]
+        fetched.update(counted)
+
+        updated_at = datetime.utcnow().isoformat()
+        fetched = {video_id: dict(stats, updated_at=updated_at) for video_id, stats in fetched.items()}
+        with _reply_stats_lock:
+            for video_id, stats in fetched.items():
+                _reply_stats_cache[(user_id, video_id)] = stats
+        if fetched:
+            database.save_video_reply_stats(user_id, fetched)
+        results.update(fetched)
+    return results
+
+def invalidate_reply_stats(user_id, video_id=None):
+    """
+    Drops the cached stats of a video (after replying, deleting or marking threads on it),
+    or of all the user's videos when video_id is unknown. Stored rows written before
+    now are ignored by this process until they are recomputed.
+    """
+    with _reply_stats_lock:
+        _reply_stats_dirty_at[(user_id, video_id or None)] = time.time()
+        if video_id:
+            _reply_stats_cache.pop((user_id, video_id), None)
+            return
+        for key in [k for k in _reply_stats_cache.keys() if k[0] == user_id]:
+            _reply_stats_cache.pop(key, None)
 
 def get_aggregated_reply_stats(user_id, limit=5):
     """
@@ -344,17 +873,13 @@ def get_aggregated_reply_stats(user_id, limit=5):
     Costs 'limit' units (1 per video).
     """
     videos = get_recent_videos(user_id, limit=limit)
+    stats_map = get_reply_stats_map(user_id, [video['id'] for video in videos])
     total_replied = 0
     total_unreplied = 0
     
-    for video in videos:
-        try:
-            data = get_video_comments(user_id, video['id'])
-            stats = data['stats']
-            total_replied += stats['replied']
-            total_unreplied += stats['unreplied']
-        except Exception:
-            pass
+    for stats in stats_map.values():
+        total_replied += stats['replied']
+        total_unreplied += stats['unreplied']
             
     total = total_replied + total_unreplied
     rate = 0
@@ -368,9 +893,25 @@ def get_aggregated_reply_stats(user_id, limit=5):
         'rate': rate
     }
 
-def post_reply(user_id, parent_id, text):
-    youtube = get_youtube_client(user_id)
-    response = youtube.comments().insert(
+def _is_retryable(e):
+    """
+    Rate limits and 503; quotaExceeded, other 4xx and other 5xx are final.
+    """
+    if not isinstance(e, HttpError):
+        return False
+    status = e.resp.status
+    if status in _RETRYABLE_STATUSES:
+        return True
+    return status == 403 and ('rateLimitExceeded' in str(e) or 'userRateLimitExceeded' in str(e))
+
+@retry(
+    retry=retry_if_exception(_is_retryable),
+    stop=stop_after_attempt(POST_REPLY_ATTEMPTS),
+    wait=wait_random_exponential(multiplier=0.5, max=POST_REPLY_BACKOFF_MAX_SEC),
+    reraise=True
+)
+def _insert_reply(youtube, parent_id, text):
+    return youtube.comments().insert(
         part='snippet',
         body={
             'snippet': {
@@ -379,19 +920,110 @@ def post_reply(user_id, parent_id, text):
             }
         }
     ).execute()
-    
-    # Auto-clear "pending" status if it exists
+
+def _after_reply(user_id, parent_id, response, jwt):
+    """Returns the video id of the replied thread if the snapshot has it, else None."""
+    # Keep the stored snapshot in sync so the thread doesn't show as unreplied until the next full crawl
+    video_id = None
     try:
-        user = database.get_user(user_id)
-        jwt = user.get('jwt')
-        database.delete_thread_state(user_id, parent_id, jwt=jwt)
+        video_id = _record_own_reply(user_id, parent_id, response)
     except Exception as e:
-        print(f"[WARN] Failed to auto-clear thread state: {e}")
+        print(f"[WARN] Failed to update comment snapshot: {e}")
+
+    # Auto-clear "pending" status if it exists (in the background; a replied thread
+    # is shown as replied whatever its state)
+    if not database.clear_thread_state_later(user_id, parent_id, jwt=jwt):
+        print(f"[WARN] Write queue full. Thread state of {parent_id} not cleared.")
+    return video_id
+
+def post_reply(user_id, parent_id, text, video_id=None):
+    user = database.get_user(user_id)
+    youtube = google_clients.get_client(user_id, user, 'youtube', 'v3')
+    response = _insert_reply(youtube, parent_id, text)
 
+    video_id = _after_reply(user_id, parent_id, response, (user or {}).get('jwt')) or video_id
+    invalidate_reply_stats(user_id, video_id)
     return response
 
-def delete_comment(user_id, comment_id):
+def post_replies(user_id, replies, deadline=POST_REPLIES_DEADLINE_SEC):
+    """
+    Posts many replies ({parent_id: text}) on the shared fan-out pool, at most
+    fanout.PER_USER_CONCURRENCY at a time for this user, each retried with backoff
+    on rate limits and 503. Yields (parent_id, response, error) as posts finish.
+    Replies not started by the deadline are not posted and come back as TimeoutError;
+    posts already in flight are waited for, so a reply that went public is always
+    reported (and logged) as posted.
+
+    The user row is read once for the whole batch, thread-state cleanups go through
+    the write-behind queue (one delete per flush) and reply stats are invalidated once
+    per video replied to (for the whole user if a thread's video isn't known).
+    """
+    user = database.get_user(user_id)
+    jwt = (user or {}).get('jwt')
+    touched = set()
+
+    def post(parent_id):
+        # Clients are per thread (httplib2 isn't thread-safe)
+        youtube = google_clients.get_client(user_id, user, 'youtube', 'v3')
+        response = _insert_reply(youtube, parent_id, replies[parent_id])
+        touched.add(_after_reply(user_id, parent_id, response, jwt))
+        return response
+
+    try:
+        yield from fanout.iter_completed(user_id, post, list(replies), deadline=deadline, wait_running=True)
+    finally:
+        if None in touched:
+            invalidate_reply_stats(user_id)
+        else:
+            for video_id in touched:
+                invalidate_reply_stats(user_id, video_id)
+
+def _record_own_reply(user_id, parent_id, response):
+    found = comment_store.find_thread(user_id, parent_id)
+    if not found:
+        return None
+    video_id, record = found
+    snippet = response['snippet']
+    record.replies += (Reply(
+        id=response['id'],
+        text=snippet.get('textOriginal', snippet.get('textDisplay', '')),
+        author_name=snippet.get('authorDisplayName', ''),
+        author_image=snippet.get('authorProfileImageUrl', ''),
+        published_at=snippet.get('publishedAt', ''),
+        updated_at=snippet.get('updatedAt', snippet.get('publishedAt', '')),
+        like_count=0,
+        video_id=video_id,
+        is_mine=True
+    ),)
+    record.reply_count += 1
+    record.is_replied = True
+    comment_store.put_thread(user_id, video_id, record)
+    return video_id
+
+def _forget_comment(user_id, comment_id):
+    """Returns the video id of the comment if the snapshot has it, else None."""
+    # Reply IDs are "<thread_id>.<reply_id>"; anything else is a top-level comment
+    found = comment_store.find_thread(user_id, comment_id.split('.')[0])
+    if '.' not in comment_id:
+        comment_store.delete_thread(user_id, comment_id)
+        return found[0] if found else None
+    if not found:
+        return None
+    video_id, record = found
+    record.replies = tuple(r for r in record.replies if r.id != comment_id)
+    record.reply_count = max(0, record.reply_count - 1)
+    record.is_replied = any(r.is_mine for r in record.replies)
+    comment_store.put_thread(user_id, video_id, record)
+    return video_id
+
+def delete_comment(user_id, comment_id, video_id=None):
     youtube = get_youtube_client(user_id)
     youtube.comments().delete(id=comment_id).execute()
 
+    try:
+        video_id = _forget_comment(user_id, comment_id) or video_id
+    except Exception as e:
+        print(f"[WARN] Failed to update comment snapshot: {e}")
+    invalidate_reply_stats(user_id, video_id)
+
 # rate_comment function removed due to API limitations
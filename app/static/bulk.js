@@ -46,30 +46,144 @@ async function bulkGenerate() {
     let successCount = 0;
     let failCount = 0;
 
-    for (let i = 0; i < selected.length; i++) {
-        const comment = selected[i];
-
-        try {
-            await generateReply(comment.id, comment.videoId, comment.text);
-            successCount++;
-        } catch (error) {
-            console.error(`Failed to generate reply for comment ${comment.id}:`, error);
-            failCount++;
+    try {
+        // One streamed request: the server generates in parallel and sends
+        // one NDJSON line per comment as soon as it is ready
+        const response = await fetch('/generate_replies_batch', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                video_id: selected[0].videoId,
+                comments: selected.map(comment => ({ id: comment.id, text: comment.text }))
+            }),
+        });
+
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
         }
 
-        modal.update(i + 1, successCount, failCount);
+        await readNdjson(response, result => {
+            if (result.status === 'success') {
+                renderSuggestions(result.comment_id, result.suggestions);
+                successCount++;
+            } else {
+                console.error(`Failed to generate reply for comment ${result.comment_id}:`, result.message);
+                failCount++;
+            }
+            modal.update(successCount + failCount, successCount, failCount);
+        });
+    } catch (error) {
+        console.error('Bulk generation failed:', error);
+        failCount = selected.length - successCount;
+    }
 
-        // Wait 500ms to avoid API rate limits
-        if (i < selected.length - 1) {
-            await sleep(500);
+    modal.close();
+    clearSelection();
+
+    // Show summary
+    alert(`一括返信生成が完了しました。\n成功: ${successCount}件\n失敗: ${failCount}件`);
+}
+
+// Reads a newline-delimited JSON response and calls onItem for each line as it arrives
+async function readNdjson(response, onItem) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        lines.filter(line => line.trim()).forEach(line => onItem(JSON.parse(line)));
+    }
+
+    if (buffer.trim()) {
+        onItem(JSON.parse(buffer));
+    }
+}
+
+async function bulkPostReplies() {
+    // Only selected comments with a reply written (or picked from the suggestions)
+    const selected = getSelectedComments()
+        .map(comment => {
+            const textarea = document.getElementById(`reply-text-${comment.id}`);
+            return { ...comment, replyText: textarea ? textarea.value.trim() : '' };
+        })
+        .filter(comment => comment.replyText);
+    if (selected.length === 0) {
+        alert('返信文が入力されたコメントを選択してください');
+        return;
+    }
+
+    if (!confirm(`${selected.length}件のコメントに返信を投稿します。よろしいですか？`)) {
+        return;
+    }
+
+    // Show progress modal
+    const modal = showProgressModal(selected.length, '返信投稿中');
+    const byId = Object.fromEntries(selected.map(comment => [comment.id, comment]));
+
+    let successCount = 0;
+    let failCount = 0;
+    let errorMessage = '';
+
+    try {
+        // One streamed request: the server posts in parallel (with retries) and
+        // sends one NDJSON line per reply as soon as it is posted
+        const response = await fetch('/post_replies_batch', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                video_id: selected[0].videoId,
+                replies: selected.map(comment => ({
+                    parent_id: comment.id,
+                    reply_text: comment.replyText,
+                    video_id: comment.videoId,
+                    original_comment: document.getElementById(`original-comment-${comment.id}`)?.value || '',
+                    ai_suggestion: document.getElementById(`ai-suggestion-${comment.id}`)?.value || ''
+                }))
+            }),
+        });
+
+        if (!response.ok) {
+            // e.g. more replies than the server accepts in one batch
+            const data = await response.json().catch(() => ({}));
+            throw new Error(data.message || `HTTP ${response.status}`);
         }
+
+        await readNdjson(response, result => {
+            if (result.done) return;
+            if (result.status === 'success') {
+                const comment = byId[result.parent_id];
+                const card = document.getElementById(`comment-${comment.id}`);
+                const isReplied = card ? card.classList.contains('replied-comment-card') : false;
+                applyPostedReplyUI(comment.id, result, comment.replyText, isReplied, comment.videoId);
+                successCount++;
+            } else {
+                console.error(`Failed to post reply to comment ${result.parent_id}:`, result.message);
+                failCount++;
+            }
+            modal.update(successCount + failCount, successCount, failCount);
+        });
+    } catch (error) {
+        console.error('Bulk posting failed:', error);
+        failCount = selected.length - successCount;
+        errorMessage = error.message;
     }
 
     modal.close();
     clearSelection();
 
     // Show summary
-    alert(`一括返信生成が完了しました。\n成功: ${successCount}件\n失敗: ${failCount}件`);
+    alert(`一括返信投稿が完了しました。\n成功: ${successCount}件\n失敗: ${failCount}件` +
+        (errorMessage ? `\nエラー: ${errorMessage}` : ''));
 }
 
 async function bulkMarkComplete() {
@@ -89,25 +203,39 @@ async function bulkMarkComplete() {
     let successCount = 0;
     let failCount = 0;
 
-    for (let i = 0; i < selected.length; i++) {
-        const comment = selected[i];
-
-        try {
-            await markComplete(comment.id);
-            successCount++;
-        } catch (error) {
-            console.error(`Failed to mark complete for comment ${comment.id}:`, error);
-            failCount++;
-        }
-
-        modal.update(i + 1, successCount, failCount);
-
-        // Wait 200ms between operations
-        if (i < selected.length - 1) {
-            await sleep(200);
+    try {
+        // One request (and one database write) for the whole selection
+        const response = await fetch('/mark_complete_batch', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                video_id: selected[0].videoId,
+                comment_ids: selected.map(comment => comment.id)
+            }),
+        });
+        const data = await response.json();
+
+        if (data.status === 'success') {
+            selected.forEach(comment => {
+                if (data.results[comment.id] === 'success') {
+                    applyMarkedCompleteUI(comment.id, comment.videoId);
+                    successCount++;
+                } else {
+                    failCount++;
+                }
+            });
+        } else {
+            console.error('Bulk mark complete failed:', data.message);
+            failCount = selected.length;
         }
+    } catch (error) {
+        console.error('Bulk mark complete failed:', error);
+        failCount = selected.length;
     }
 
+    modal.update(selected.length, successCount, failCount);
     modal.close();
     clearSelection();
 
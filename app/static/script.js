@@ -1,14 +1,14 @@
 async function generateReply(commentId, videoId, commentText) {
     const btn = document.querySelector(`#comment-${commentId} .btn-generate`);
-    const suggestionsBox = document.getElementById(`suggestions-${commentId}`);
-
-
 
     // Determine which button is active
     const regenBtn = document.getElementById(`btn-regenerate-${commentId}`);
     let activeBtn = btn;
+    let regenerate = false;
     if (regenBtn && regenBtn.style.display !== 'none') {
         activeBtn = regenBtn;
+        // Ask for fresh suggestions instead of the cached ones
+        regenerate = true;
     }
 
     activeBtn.disabled = true;
@@ -34,7 +34,8 @@ async function generateReply(commentId, videoId, commentText) {
             },
             body: JSON.stringify({
                 comment_text: commentText,
-                video_id: videoId
+                video_id: videoId,
+                regenerate: regenerate
             }),
         });
 
@@ -51,36 +52,11 @@ async function generateReply(commentId, videoId, commentText) {
             throw new Error("Invalid response from server");
         }
 
-        suggestionsBox.innerHTML = '';
-        data.suggestions.forEach((suggestion, index) => {
-            const chip = document.createElement('div');
-            chip.className = 'suggestion-chip';
-            chip.textContent = suggestion;
-            chip.onclick = () => selectSuggestion(commentId, suggestion);
-
-            if (index === 0) {
-                document.getElementById(`ai-suggestion-${commentId}`).value = suggestion;
-            }
-
-            suggestionsBox.appendChild(chip);
-        });
-
-        suggestionsBox.style.display = 'flex';
-        document.getElementById(`reply-text-${commentId}`).style.display = 'block';
-        document.getElementById(`btn-post-${commentId}`).style.display = 'block';
-
         // Reset button state before switching
         activeBtn.disabled = false;
         activeBtn.textContent = originalText;
 
-        // Switch buttons
-        btn.style.display = 'none';
-        if (regenBtn) {
-            regenBtn.style.display = 'inline-block';
-            regenBtn.disabled = false;
-            regenBtn.textContent = "🔄 再生成";
-        }
-
+        renderSuggestions(commentId, data.suggestions);
 
     } catch (error) {
         // Clear the timer on error
@@ -91,6 +67,40 @@ async function generateReply(commentId, videoId, commentText) {
     }
 }
 
+// Shows suggestion chips for a comment and switches to the "regenerate" button
+function renderSuggestions(commentId, suggestions) {
+    const suggestionsBox = document.getElementById(`suggestions-${commentId}`);
+    if (!suggestionsBox) return;
+
+    suggestionsBox.innerHTML = '';
+    suggestions.forEach((suggestion, index) => {
+        const chip = document.createElement('div');
+        chip.className = 'suggestion-chip';
+        chip.textContent = suggestion;
+        chip.onclick = () => selectSuggestion(commentId, suggestion);
+
+        if (index === 0) {
+            document.getElementById(`ai-suggestion-${commentId}`).value = suggestion;
+        }
+
+        suggestionsBox.appendChild(chip);
+    });
+
+    suggestionsBox.style.display = 'flex';
+    document.getElementById(`reply-text-${commentId}`).style.display = 'block';
+    document.getElementById(`btn-post-${commentId}`).style.display = 'block';
+
+    // Switch buttons
+    const btn = document.getElementById(`btn-generate-${commentId}`);
+    const regenBtn = document.getElementById(`btn-regenerate-${commentId}`);
+    if (btn) btn.style.display = 'none';
+    if (regenBtn) {
+        regenBtn.style.display = 'inline-block';
+        regenBtn.disabled = false;
+        regenBtn.textContent = "🔄 再生成";
+    }
+}
+
 function selectSuggestion(commentId, text) {
     const textarea = document.getElementById(`reply-text-${commentId}`);
     textarea.value = text;
@@ -129,70 +139,7 @@ async function postReply(commentId, isReplied = false, videoId = '') {
 
         if (data.status === 'success') {
             console.log('New reply ID:', data.id);
-            const card = document.getElementById(`comment-${commentId}`);
-
-            // Create reply thread container if it doesn't exist
-            let thread = document.getElementById(`thread-${commentId}`);
-            if (!thread) {
-                thread = document.createElement('div');
-                thread.className = 'reply-thread';
-                thread.id = `thread-${commentId}`;
-                // Insert after comment-text
-                const commentTextDiv = card.querySelector('.comment-text');
-                commentTextDiv.parentNode.insertBefore(thread, commentTextDiv.nextSibling);
-            }
-
-            // Create new reply item
-            const newReply = document.createElement('div');
-            newReply.className = 'reply-item my-reply';
-            newReply.id = `comment-${data.id}`;
-            newReply.innerHTML = `
-                <img src="${data.author_image || '/static/default-avatar.png'}" alt="${data.author_name || 'You'}" class="reply-author-img">
-                <div class="reply-content">
-                    <div class="reply-header">
-                        <span class="reply-author-name">@${data.author_name || 'You'}</span>
-                        <span class="reply-date">${data.published_at ? data.published_at.substring(0, 10) : new Date().toISOString().split('T')[0]}</span>
-                        <button class="btn-icon-small" onclick="deleteComment('${data.id}')" title="削除">🗑️</button>
-                    </div>
-                    <div class="reply-text">${text}</div>
-                </div>
-            `;
-            thread.appendChild(newReply);
-
-            // If it was unreplied, mark it as replied and move it
-            if (!isReplied) {
-                card.classList.add('replied-comment-card');
-
-                // Move to bottom of the list
-                const list = document.getElementById('comments-list');
-                list.appendChild(card);
-
-                // Update button onclick to treat it as replied next time
-                btn.setAttribute('onclick', `postReply('${commentId}', true, '${videoId}')`);
-            }
-
-            // Reset the form
-            textarea.value = '';
-
-
-            // Just clear suggestions
-            const suggestionsBox = document.getElementById(`suggestions-${commentId}`);
-            if (suggestionsBox) suggestionsBox.style.display = 'none';
-
-            // Reset generate button
-            const genBtn = document.getElementById(`btn-generate-${commentId}`);
-            const regenBtn = document.getElementById(`btn-regenerate-${commentId}`);
-            if (genBtn) genBtn.style.display = 'inline-block';
-            if (regenBtn) regenBtn.style.display = 'none';
-
-            btn.disabled = false;
-            btn.textContent = "返信を投稿";
-
-            // Update Reply Rate Widget
-            // Update Reply Rate Widget with Animation
-            // Unreplied -1, Pending 0, Replied +1
-            updateStatsUI(-1, 0, 1);
-
+            applyPostedReplyUI(commentId, data, text, isReplied, videoId);
         } else {
             alert('投稿失敗: ' + data.message);
             btn.disabled = false;
@@ -205,6 +152,76 @@ async function postReply(commentId, isReplied = false, videoId = '') {
         btn.textContent = "返信を投稿";
     }
 }
+
+// Adds the posted reply to its card and moves the card to the replied state
+// (also used by bulkPostReplies)
+function applyPostedReplyUI(commentId, data, text, isReplied, videoId) {
+    const textarea = document.getElementById(`reply-text-${commentId}`);
+    const btn = document.getElementById(`btn-post-${commentId}`);
+    const card = document.getElementById(`comment-${commentId}`);
+
+    // Create reply thread container if it doesn't exist
+    let thread = document.getElementById(`thread-${commentId}`);
+    if (!thread) {
+        thread = document.createElement('div');
+        thread.className = 'reply-thread';
+        thread.id = `thread-${commentId}`;
+        // Insert after comment-text
+        const commentTextDiv = card.querySelector('.comment-text');
+        commentTextDiv.parentNode.insertBefore(thread, commentTextDiv.nextSibling);
+    }
+
+    // Create new reply item
+    const newReply = document.createElement('div');
+    newReply.className = 'reply-item my-reply';
+    newReply.id = `comment-${data.id}`;
+    newReply.innerHTML = `
+        <img src="${data.author_image || '/static/default-avatar.png'}" alt="${data.author_name || 'You'}" class="reply-author-img">
+        <div class="reply-content">
+            <div class="reply-header">
+                <span class="reply-author-name">@${data.author_name || 'You'}</span>
+                <span class="reply-date">${data.published_at ? data.published_at.substring(0, 10) : new Date().toISOString().split('T')[0]}</span>
+                <button class="btn-icon-small" onclick="deleteComment('${data.id}')" title="削除">🗑️</button>
+            </div>
+            <div class="reply-text">${text}</div>
+        </div>
+    `;
+    thread.appendChild(newReply);
+
+    // If it was unreplied, mark it as replied and move it
+    if (!isReplied) {
+        card.classList.add('replied-comment-card');
+
+        // Move to bottom of the list
+        const list = document.getElementById('comments-list');
+        list.appendChild(card);
+
+        // Update button onclick to treat it as replied next time
+        btn.setAttribute('onclick', `postReply('${commentId}', true, '${videoId}')`);
+    }
+
+    // Reset the form
+    textarea.value = '';
+
+    // Just clear suggestions
+    const suggestionsBox = document.getElementById(`suggestions-${commentId}`);
+    if (suggestionsBox) suggestionsBox.style.display = 'none';
+
+    // Reset generate button
+    const genBtn = document.getElementById(`btn-generate-${commentId}`);
+    const regenBtn = document.getElementById(`btn-regenerate-${commentId}`);
+    if (genBtn) genBtn.style.display = 'inline-block';
+    if (regenBtn) regenBtn.style.display = 'none';
+
+    btn.disabled = false;
+    btn.textContent = "返信を投稿";
+
+    // Update Reply Rate Widget
+    // Update Reply Rate Widget with Animation
+    // Unreplied -1, Pending 0, Replied +1
+    updateStatsUI(-1, 0, 1);
+}
+
 function toggleSection(id, header) {
     const list = document.getElementById(id);
     if (list.style.display === 'none') {
@@ -298,7 +315,7 @@ async function deleteComment(commentId) {
     }
 }
 
-async function markComplete(commentId) {
+async function markComplete(commentId, videoId = '') {
     const btn = document.querySelector(`#comment-${commentId} .btn-icon[title="既読にする（保留）"]`);
     if (btn) btn.disabled = true;
 
@@ -308,52 +325,13 @@ async function markComplete(commentId) {
             headers: {
                 'Content-Type': 'application/json',
             },
-            body: JSON.stringify({ comment_id: commentId }),
+            body: JSON.stringify({ comment_id: commentId, video_id: videoId }),
         });
 
         const data = await response.json();
         if (data.status === 'success') {
             // Optimistic UI Update - No Reload
-
-            // 1. Update Buttons
-            // Hide "Mark Complete", Show "Unmark"
-            // Since "Unmark" button might not exist if it wasn't pending, we might need to recreate it or toggle visibility if both exist.
-            // Looking at template: It uses {% if %} so only one exists in DOM. We need to replace the button.
-
-            const metaRight = document.getElementById(`meta-${commentId}`);
-            if (metaRight) {
-                // Remove the "Mark Complete" button
-                if (btn) btn.remove();
-
-                // Add the "Unmark" button
-                // Check if it already exists (unlikely in this flow but just in case)
-                let unmarkBtn = metaRight.querySelector('.btn-icon[title="既読を取り消す"]');
-                if (!unmarkBtn) {
-                    unmarkBtn = document.createElement('button');
-                    unmarkBtn.className = 'btn-icon';
-                    unmarkBtn.onclick = () => unmarkComplete(commentId);
-                    unmarkBtn.title = "既読を取り消す";
-                    unmarkBtn.innerHTML = '<span class="icon-emoji">↩️</span>';
-
-                    // Insert before the delete button (last child usually)
-                    const deleteBtn = metaRight.querySelector('.btn-icon[title="削除"]');
-                    if (deleteBtn) {
-                        metaRight.insertBefore(unmarkBtn, deleteBtn);
-                    } else {
-                        metaRight.appendChild(unmarkBtn);
-                    }
-                }
-            }
-
-            // Update Stats (Unreplied -1, Pending +1)
-            updateStatsUI(-1, 1, 0);
-
-            // 3. Update Card Style
-            const card = document.getElementById(`comment-${commentId}`);
-            if (card) {
-                card.classList.add('pending-comment-card');
-            }
-
+            applyMarkedCompleteUI(commentId, videoId);
         } else {
             alert('完了マークに失敗しました: ' + (data.message || '不明なエラー'));
             if (btn) btn.disabled = false;
@@ -364,7 +342,49 @@ async function markComplete(commentId) {
     }
 }
 
-async function unmarkComplete(commentId) {
+// Switches a card to the pending state (also used by bulkMarkComplete)
+function applyMarkedCompleteUI(commentId, videoId = '') {
+    const btn = document.querySelector(`#comment-${commentId} .btn-icon[title="既読にする（保留）"]`);
+
+    // 1. Update Buttons
+    // Hide "Mark Complete", Show "Unmark"
+    // The template uses {% if %} so only one exists in DOM. We need to replace the button.
+    const metaRight = document.getElementById(`meta-${commentId}`);
+    if (metaRight) {
+        // Remove the "Mark Complete" button
+        if (btn) btn.remove();
+
+        // Add the "Unmark" button
+        // Check if it already exists (unlikely in this flow but just in case)
+        let unmarkBtn = metaRight.querySelector('.btn-icon[title="既読を取り消す"]');
+        if (!unmarkBtn) {
+            unmarkBtn = document.createElement('button');
+            unmarkBtn.className = 'btn-icon';
+            unmarkBtn.onclick = () => unmarkComplete(commentId, videoId);
+            unmarkBtn.title = "既読を取り消す";
+            unmarkBtn.innerHTML = '<span class="icon-emoji">↩️</span>';
+
+            // Insert before the delete button (last child usually)
+            const deleteBtn = metaRight.querySelector('.btn-icon[title="削除"]');
+            if (deleteBtn) {
+                metaRight.insertBefore(unmarkBtn, deleteBtn);
+            } else {
+                metaRight.appendChild(unmarkBtn);
+            }
+        }
+    }
+
+    // 2. Update Stats (Unreplied -1, Pending +1)
+    updateStatsUI(-1, 1, 0);
+
+    // 3. Update Card Style
+    const card = document.getElementById(`comment-${commentId}`);
+    if (card) {
+        card.classList.add('pending-comment-card');
+    }
+}
+
+async function unmarkComplete(commentId, videoId = '') {
     const btn = document.querySelector(`#comment-${commentId} .btn-icon[title="既読を取り消す"]`);
     if (btn) btn.disabled = true;
 
@@ -374,7 +394,7 @@ async function unmarkComplete(commentId) {
             headers: {
                 'Content-Type': 'application/json',
             },
-            body: JSON.stringify({ comment_id: commentId }),
+            body: JSON.stringify({ comment_id: commentId, video_id: videoId }),
         });
 
         const data = await response.json();
@@ -392,7 +412,7 @@ async function unmarkComplete(commentId) {
                 if (!markBtn) {
                     markBtn = document.createElement('button');
                     markBtn.className = 'btn-icon';
-                    markBtn.onclick = () => markComplete(commentId);
+                    markBtn.onclick = () => markComplete(commentId, videoId);
                     markBtn.title = "既読にする（保留）";
                     markBtn.innerHTML = '<span class="icon-emoji">✅</span>';
 
@@ -504,3 +524,83 @@ function insertTemplate(commentId, text) {
     textarea.value = text;
     document.getElementById(`templates-${commentId}`).style.display = 'none';
 }
+
+// Infinite Scroll (Comments Page)
+// The first page is rendered by the server; the rest is appended from /api/comments.
+let commentsLoading = false;
+let commentsObserver = null;
+
+async function loadMoreComments() {
+    const list = document.getElementById('comments-list');
+    const loader = document.getElementById('comments-loader');
+    if (!list || commentsLoading) return;
+
+    let cursor = list.dataset.nextCursor;
+    if (!cursor) return;
+
+    commentsLoading = true;
+    try {
+        // Passthrough pages can be empty after filtering, so keep going until something is added
+        let added = 0;
+        while (cursor && added === 0) {
+            const url = new URL(list.dataset.apiUrl, window.location.origin);
+            url.searchParams.set('cursor', cursor);
+            const response = await fetch(url);
+            const data = await response.json();
+
+            if (data.status !== 'success') {
+                console.error('Failed to load comments:', data.message);
+                list.dataset.nextCursor = '';
+                break;
+            }
+
+            // A thread that changed status since an earlier page can be served again
+            // (grouped "all" view); keep the card already on screen
+            const template = document.createElement('template');
+            template.innerHTML = data.html;
+            template.content.querySelectorAll('.comment-card').forEach(card => {
+                if (document.getElementById(card.id)) card.remove();
+            });
+            list.appendChild(template.content);
+            added = data.comments.length;
+            cursor = data.next_cursor || '';
+            list.dataset.nextCursor = cursor;
+            if (data.stats) setStatsUI(data.stats);
+        }
+    } catch (error) {
+        console.error('Failed to load comments:', error);
+        list.dataset.nextCursor = '';
+    } finally {
+        commentsLoading = false;
+        if (loader && !list.dataset.nextCursor) {
+            loader.style.display = 'none';
+        } else if (loader && commentsObserver) {
+            // Re-observe so a loader that is still on screen triggers the next page
+            commentsObserver.unobserve(loader);
+            commentsObserver.observe(loader);
+        }
+    }
+}
+
+// Fills in counts that were unknown at first paint ('…')
+function setStatsUI(stats) {
+    const widget = document.querySelector('.stats-widget');
+    if (!widget) return;
+
+    ['unreplied', 'pending', 'replied'].forEach(key => {
+        const el = widget.querySelector(`.stat-item.${key} .stat-count`);
+        if (el && isNaN(parseInt(el.textContent))) {
+            el.textContent = stats[key];
+        }
+    });
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    const loader = document.getElementById('comments-loader');
+    if (!loader || !document.getElementById('comments-list')) return;
+
+    commentsObserver = new IntersectionObserver(entries => {
+        if (entries.some(entry => entry.isIntersecting)) loadMoreComments();
+    }, { rootMargin: '600px' });
+    commentsObserver.observe(loader);
+});
@@ -0,0 +1,103 @@
+"""
+Incremental character n-gram TF-IDF index for short texts (YouTube comments).
+
+Documents are stored as length-normalized sublinear term frequencies in an
+inverted index; IDF is computed at query time from posting-list lengths, so
+adding a document never requires re-weighting the rest of the index.
+"""
+import math
+import heapq
+from operator import itemgetter
+import threading
+import unicodedata
+from collections import defaultdict
+
+NGRAM_SIZES = (2, 3)
+# Grams present in more than this share of documents carry almost no signal and
+# have the longest posting lists, so they are skipped at query time
+MAX_DF_RATIO = 0.2
+MIN_DOCS_FOR_DF_CUTOFF = 20
+# Posting entries visited per query. Grams are visited rarest (highest IDF) first,
+# so the budget only drops the least informative ones and keeps lookups well
+# under a millisecond on indexes with tens of thousands of documents.
+POSTINGS_BUDGET = 2000
+
+
+def normalize(text):
+    return ' '.join(unicodedata.normalize('NFKC', text or '').lower().split())
+
+
+def _ngram_weights(text):
+    padded = f" {normalize(text)} "
+    counts = defaultdict(int)
+    for n in NGRAM_SIZES:
+        for i in range(len(padded) - n + 1):
+            counts[padded[i:i + n]] += 1
+    return {gram: 1.0 + math.log(count) for gram, count in counts.items()}
+
+
+class NgramIndex:
+    """
+    Thread-safe index of (text, payload) documents searchable by text similarity.
+    Adding a text that is already indexed replaces its payload (newest wins).
+    """
+
+    def __init__(self):
+        self._payloads = []
+        self._postings = defaultdict(list)
+        self._doc_by_text = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._payloads)
+
+    def add(self, text, payload):
+        key = normalize(text)
+        if not key:
+            return
+        with self._lock:
+            doc_id = self._doc_by_text.get(key)
+            if doc_id is not None:
+                self._payloads[doc_id] = payload
+                return
+
+            weights = _ngram_weights(text)
+            # Document length normalization is folded into the stored weights
+            norm = math.sqrt(sum(w * w for w in weights.values()))
+            doc_id = len(self._payloads)
+            self._payloads.append(payload)
+            self._doc_by_text[key] = doc_id
+            for gram, weight in weights.items():
+                self._postings[gram].append((doc_id, weight / norm))
+
+    def search(self, text, k=3):
+        """
+        Returns up to k payloads ordered by similarity to text (best first).
+        """
+        query = _ngram_weights(text)
+        with self._lock:
+            total_docs = len(self._payloads)
+            if not total_docs or not query:
+                return []
+
+            max_df = total_docs * MAX_DF_RATIO if total_docs >= MIN_DOCS_FOR_DF_CUTOFF else total_docs
+            grams = []
+            for gram, q_weight in query.items():
+                postings = self._postings.get(gram)
+                if postings and len(postings) <= max_df:
+                    grams.append((len(postings), q_weight, postings))
+            grams.sort(key=lambda item: item[0])
+
+            scores = defaultdict(float)
+            budget = POSTINGS_BUDGET
+            for df, q_weight, postings in grams:
+                if df > budget and scores:
+                    break
+                budget -= df
+                idf = math.log((total_docs + 1) / (df + 1)) + 1.0
+                factor = q_weight * idf * idf
+                for doc_id, d_weight in postings:
+                    scores[doc_id] += factor * d_weight
+
+            best = heapq.nlargest(k, scores.items(), key=itemgetter(1))
+            return [self._payloads[doc_id] for doc_id, _ in best]
@@ -1,4 +1,5 @@
 import os
+from httpx import Headers
 from supabase import create_client, Client
 
 url: str = os.environ.get("SUPABASE_URL")
@@ -16,3 +17,18 @@ if service_key:
     supabase_admin = create_client(url, service_key)
 else:
     print("⚠️ WARNING: SUPABASE_SERVICE_KEY not found. Backend operations requiring admin privileges (bypassing RLS) will fail.")
+
+def table_for(name, jwt=None):
+    """
+    Returns a request builder for a table on the shared clients, so their pooled
+    HTTP sessions are reused. Uses the service-role client when configured;
+    otherwise the anon client with the user's JWT set on this request only
+    (the shared client's own headers are left untouched).
+    """
+    if supabase_admin:
+        return supabase_admin.table(name)
+    builder = supabase.table(name)
+    if jwt:
+        builder.headers = Headers(builder.headers)
+        builder.headers["Authorization"] = f"Bearer {jwt}"
+    return builder
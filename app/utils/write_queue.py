@@ -0,0 +1,133 @@
+"""
+In-process write-behind queue.
+
+Callers enqueue (kind, item) pairs and return immediately; a background thread
+drains the queue every flush interval (or as soon as a batch fills up), groups
+items by kind and hands each group to a flush function that writes it in one
+round trip. Failed batches are retried with backoff and then dropped. Memory is
+bounded: puts beyond max_size are dropped and counted rather than blocking the
+request thread.
+"""
+import threading
+import time
+from collections import deque
+
+
+class WriteBehindQueue:
+
+    def __init__(self, flush, max_size=10000, batch_size=200, interval=2.0, max_retries=3, name='write-behind'):
+        """
+        flush(kind, items) writes one batch and raises on failure.
+        """
+        self._flush = flush
+        self._max_size = max_size
+        self._batch_size = batch_size
+        self._interval = interval
+        self._max_retries = max_retries
+        self._name = name
+
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self._writing = False
+        self._stats = {'enqueued': 0, 'written': 0, 'dropped': 0, 'failed_batches': 0, 'retries': 0}
+
+    def put(self, kind, item):
+        """
+        Queues one write. Returns False if it was dropped (queue full or closed).
+        """
+        with self._cond:
+            if self._closed or len(self._items) >= self._max_size:
+                self._stats['dropped'] += 1
+                return False
+            self._items.append((kind, item))
+            self._stats['enqueued'] += 1
+            if self._thread is None:
+                # Started lazily so importing the module (or forking) doesn't spawn threads
+                self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+                self._thread.start()
+            if len(self._items) >= self._batch_size:
+                self._cond.notify()
+        return True
+
+    def _take_batch(self):
+        items = []
+        while self._items and len(items) < self._batch_size:
+            items.append(self._items.popleft())
+        return items
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if len(self._items) < self._batch_size and not self._closed:
+                    self._cond.wait(self._interval)
+                batch = self._take_batch()
+                if not batch and self._closed:
+                    return
+                self._writing = bool(batch)
+            if batch:
+                try:
+                    self._write(batch)
+                finally:
+                    with self._cond:
+                        self._writing = False
+                        self._cond.notify_all()
+
+    def _write(self, batch):
+        groups = {}
+        for kind, item in batch:
+            groups.setdefault(kind, []).append(item)
+
+        for kind, items in groups.items():
+            for attempt in range(self._max_retries + 1):
+                try:
+                    self._flush(kind, items)
+                    with self._cond:
+                        self._stats['written'] += len(items)
+                    break
+                except Exception as e:
+                    if attempt < self._max_retries:
+                        with self._cond:
+                            self._stats['retries'] += 1
+                        time.sleep(min(2 ** attempt, 10))
+                        continue
+                    print(f"[WARN] Dropping {len(items)} queued {kind} writes after {attempt + 1} attempts: {e}")
+                    with self._cond:
+                        self._stats['failed_batches'] += 1
+                        self._stats['dropped'] += len(items)
+
+    def flush(self):
+        """
+        Writes everything queued so far on the calling thread, and waits for the
+        batch the background thread may be writing, so that on return every write
+        queued before the call has been attempted.
+        """
+        while True:
+            with self._cond:
+                batch = self._take_batch()
+            if not batch:
+                break
+            self._write(batch)
+        with self._cond:
+            while self._writing:
+                self._cond.wait()
+
+    def close(self, timeout=10.0):
+        """
+        Stops accepting writes and flushes what is left (called at exit).
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        self.flush()
+
+    def get_stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats['depth'] = len(self._items)
+            stats['max_size'] = self._max_size
+        return stats
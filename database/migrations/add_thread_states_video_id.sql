@@ -0,0 +1,12 @@
+-- Migration: Add video_id to thread_states
+-- Created: 2026-10-18
+-- Purpose: Scope completed-thread lookups to one video instead of loading every id a user has marked
+
+ALTER TABLE thread_states ADD COLUMN IF NOT EXISTS video_id TEXT;
+
+-- Serves: WHERE user_id = ? AND status = 'completed' AND (video_id = ? OR video_id IS NULL)
+CREATE INDEX IF NOT EXISTS idx_thread_states_user_video_status
+    ON thread_states (user_id, video_id, status);
+
+-- Rows saved before this migration keep video_id NULL; they are matched for every
+-- video until the thread is marked again (which fills video_id in)
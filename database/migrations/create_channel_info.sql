@@ -0,0 +1,32 @@
+-- Migration: Create channel_info table
+-- Created: 2026-10-18
+-- Purpose: Cache per-user channel metadata (uploads playlist, title, icon, subscribers)
+
+CREATE TABLE IF NOT EXISTS channel_info (
+    user_id TEXT PRIMARY KEY,
+    channel_id TEXT NOT NULL,
+    name TEXT,
+    icon TEXT,
+    subscriber_count BIGINT DEFAULT 0,
+    uploads_playlist_id TEXT NOT NULL,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Enable Row Level Security
+ALTER TABLE channel_info ENABLE ROW LEVEL SECURITY;
+
+-- Create RLS policies
+-- Users can only read their own channel info
+CREATE POLICY "Users can view own channel info" ON channel_info
+    FOR SELECT
+    USING (auth.uid()::text = user_id);
+
+-- Users can only insert their own channel info
+CREATE POLICY "Users can insert own channel info" ON channel_info
+    FOR INSERT
+    WITH CHECK (auth.uid()::text = user_id);
+
+-- Users can only update their own channel info
+CREATE POLICY "Users can update own channel info" ON channel_info
+    FOR UPDATE
+    USING (auth.uid()::text = user_id);
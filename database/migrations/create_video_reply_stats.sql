@@ -0,0 +1,34 @@
+-- Migration: Create video_reply_stats table
+-- Created: 2026-10-18
+-- Purpose: Precomputed per-video reply stats (written by the stats worker and by live recounts)
+
+CREATE TABLE IF NOT EXISTS video_reply_stats (
+    user_id TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    total INTEGER NOT NULL DEFAULT 0,
+    replied INTEGER NOT NULL DEFAULT 0,
+    pending INTEGER NOT NULL DEFAULT 0,
+    unreplied INTEGER NOT NULL DEFAULT 0,
+    rate INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (user_id, video_id)
+);
+
+-- Enable Row Level Security
+ALTER TABLE video_reply_stats ENABLE ROW LEVEL SECURITY;
+
+-- Create RLS policies
+-- Users can only read their own stats
+CREATE POLICY "Users can view own video stats" ON video_reply_stats
+    FOR SELECT
+    USING (auth.uid()::text = user_id);
+
+-- Users can only insert their own stats
+CREATE POLICY "Users can insert own video stats" ON video_reply_stats
+    FOR INSERT
+    WITH CHECK (auth.uid()::text = user_id);
+
+-- Users can only update their own stats
+CREATE POLICY "Users can update own video stats" ON video_reply_stats
+    FOR UPDATE
+    USING (auth.uid()::text = user_id);
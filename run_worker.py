@@ -0,0 +1,6 @@
+from app.services import stats_worker
+
+if __name__ == '__main__':
+    # Standalone reply-stats refresher (alternative to STATS_WORKER_IN_APP=true).
+    # It keeps its own quota counters; see STATS_WORKER_DAILY_UNITS in stats_worker.py
+    stats_worker.run_forever()
@@ -0,0 +1,115 @@
+"""
+Peak-memory benchmark for the commentThreads paging pipeline.
+
+Feeds synthetic commentThreads pages (generated lazily, 100 threads per page)
+through sync_comment_snapshot / get_video_reply_counts / get_video_comments and
+reports the tracemalloc peak of each step, next to a baseline that keeps every
+raw page in memory at once (the shape of the old implementation).
+
+Usage: python scripts/bench_comment_pipeline.py [thread_count]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ['COMMENT_STORE_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench_comment_store.sqlite3')
+
+from app import database
+from app.services import youtube_service
+
+MY_CHANNEL_ID = 'UC_bench_owner'
+PAGE_SIZE = 100
+
+
+def _thread(i):
+    published = f"2024-01-01T00:00:{i % 60:02d}.{i:09d}Z"
+    snippet = {
+        'authorChannelId': {'value': f'UC_viewer_{i % 5000}'},
+        'textDisplay': f'comment number {i} ' * 4,
+        'textOriginal': f'comment number {i} ' * 4,
+        'authorDisplayName': f'viewer_{i % 5000}',
+        'authorProfileImageUrl': f'https://yt3.ggpht.com/avatar_{i % 5000}.jpg',
+        'publishedAt': published,
+        'updatedAt': published,
+        'likeCount': i % 17,
+        'viewerRating': 'none',
+    }
+    item = {'snippet': {'topLevelComment': {'id': f'thread_{i}', 'snippet': snippet}, 'totalReplyCount': 0}}
+    if i % 3 == 0:
+        reply = dict(snippet, authorChannelId={'value': MY_CHANNEL_ID}, textOriginal='thanks!', textDisplay='thanks!')
+        item['snippet']['totalReplyCount'] = 1
+        item['replies'] = {'comments': [{'id': f'thread_{i}.reply', 'snippet': reply}]}
+    return item
+
+
+class _FakeRequest:
+    def __init__(self, total, page_token):
+        self.total = total
+        self.start = int(page_token or 0)
+
+    def execute(self):
+        end = min(self.total, self.start + PAGE_SIZE)
+        response = {'items': [_thread(i) for i in range(self.total - 1 - self.start, self.total - 1 - end, -1)]}
+        if end < self.total:
+            response['nextPageToken'] = str(end)
+        return response
+
+
+class _FakeYouTube:
+    def __init__(self, total):
+        self.total = total
+
+    def commentThreads(self):
+        return self
+
+    def list(self, pageToken=None, **kwargs):
+        return _FakeRequest(self.total, pageToken)
+
+
+def _measure(label, fn):
+    tracemalloc.start()
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<40} peak {peak / 1024 / 1024:8.1f} MiB  {elapsed:6.2f}s")
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    youtube = _FakeYouTube(total)
+
+    # Keep the benchmark offline: no Supabase or Google calls
+    database.get_user = lambda user_id: {'channel_id': MY_CHANNEL_ID}
+    database.get_completed_threads = lambda user_id, video_id=None, jwt=None: frozenset(f'thread_{i}' for i in range(1, total, 50))
+    youtube_service.get_youtube_client = lambda user_id: youtube
+
+    print(f"{total} comment threads")
+
+    def all_raw_pages():
+        pages, token = [], None
+        while True:
+            response = youtube.list(pageToken=token).execute()
+            pages.append(response)
+            token = response.get('nextPageToken')
+            if not token:
+                return pages
+
+    _measure("baseline: all raw pages in memory", all_raw_pages)
+    _measure("sync_comment_snapshot (full crawl)",
+             lambda: youtube_service.sync_comment_snapshot('bench', 'video', MY_CHANNEL_ID))
+    _measure("get_video_reply_counts",
+             lambda: youtube_service.get_video_reply_counts('bench', 'video'))
+    _measure("get_comments_page (first 50)",
+             lambda: youtube_service.get_comments_page('bench', 'video'))
+    _measure("get_video_comments (all records)",
+             lambda: youtube_service.get_video_comments('bench', 'video'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Memory benchmark for the __slots__ Comment/Reply records.
+
+Builds the same synthetic threads (see bench_comment_pipeline.py) as Comment
+records and as the plain dicts they replace (record.to_dict()), and reports the
+retained memory and the number of GC-tracked objects of each.
+
+Usage: python scripts/bench_comment_records.py [thread_count]
+"""
+import gc
+import os
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.services.youtube_service import _process_thread
+from bench_comment_pipeline import MY_CHANNEL_ID, _thread
+
+
+def _measure(label, build):
+    gc.collect()
+    objects_before = len(gc.get_objects())
+    tracemalloc.start()
+    records = build()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    tracked = len(gc.get_objects()) - objects_before
+    print(f"{label:<20} {retained / 1024 / 1024:8.1f} MiB  "
+          f"{retained / len(records):7.0f} B/thread  {tracked:>9,} GC-tracked objects")
+    return records
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    # Raw items are built up front so only the records are measured
+    items = [_thread(i) for i in range(total)]
+    print(f"{total} comment threads")
+
+    _measure("dict records", lambda: [_process_thread(item, 'video', MY_CHANNEL_ID).to_dict() for item in items])
+    _measure("Comment records", lambda: [_process_thread(item, 'video', MY_CHANNEL_ID) for item in items])
+
+
+if __name__ == '__main__':
+    main()